@@ -11,6 +11,7 @@ fi
 if [ "${1:-}" = "runserver" ] || [ "${1:-}" = "uvicorn" ]; then
   poetry --directory /usr/share/turtlemail/ run python3 -m django migrate --no-input
   poetry --directory /usr/share/turtlemail/ run python3 -m django collectstatic --no-input --clear
+  poetry --directory /usr/share/turtlemail/ run python3 -m django compiletemplates
 fi
 
 _is_true() {
@@ -36,6 +37,8 @@ if [ "${1:-}" = "uvicorn" ]; then
     --host "$host" \
     --port "$port"
 elif [ "${1:-}" = "huey" ]; then
+  # reuse database connections between tasks, see DATABASE_CONN_MAX_AGE
+  export DATABASE_CONN_MAX_AGE="${DATABASE_CONN_MAX_AGE:-600}"
   exec poetry --directory /usr/share/turtlemail/ run python3 -m django run_huey
 else
   exec poetry --directory /usr/share/turtlemail/ run python3 -m django "$@"
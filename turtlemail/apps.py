@@ -5,3 +5,6 @@ class TurtlemailConfig(AppConfig):
     name = "turtlemail"
     label = "turtlemail"
     verbose_name = "Turtlemail Core"
+
+    def ready(self):
+        from turtlemail import checks, signals  # noqa: F401
@@ -18,10 +18,13 @@ from channels.security.websocket import AllowedHostsOriginValidator  # noqa: E40
 from channels.auth import AuthMiddlewareStack  # noqa: E402
 from django.urls import re_path  # noqa: E402
 
-from . import consumers  # noqa: E402
+from . import consumers, metrics  # noqa: E402
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "turtlemail.settings")
 
+# a previous worker with the same pid might not have closed its sockets
+metrics.OPEN_SOCKETS.reset()
+
 
 application = ProtocolTypeRouter(
     {
@@ -76,3 +76,25 @@ def parse_channel_layers(env_var_name: str, default=None):
         return mkconf("channels_redis.core.RedisChannelLayer", {"hosts": [env_var]})
 
     raise ValueError(f"Invalid channel layer config: {env_var}")
+
+
+def parse_caches(env_var_name: str, default=None):
+    env_var = get_env(env_var_name, default=default)
+    if env_var is None:
+        return {}
+
+    def mkconf(backend: str, location: str | None = None):
+        conf = {"BACKEND": backend, "KEY_PREFIX": "turtlemail"}
+        if location:
+            conf["LOCATION"] = location
+        return {"default": conf}
+
+    url = urllib.parse.urlparse(env_var)
+
+    if url.scheme == "memory":
+        return mkconf("django.core.cache.backends.locmem.LocMemCache")
+
+    if url.scheme in ("redis", "rediss"):
+        return mkconf("django.core.cache.backends.redis.RedisCache", env_var)
+
+    raise ValueError(f"Invalid cache config: {env_var}")
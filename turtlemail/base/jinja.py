@@ -0,0 +1,54 @@
+import logging
+from pathlib import Path
+import time
+
+from django.conf import settings
+from django.dispatch import Signal
+import jinja2
+
+logger = logging.getLogger(__name__)
+
+# sent with template_name and duration (in seconds) after a template was rendered
+template_rendered = Signal()
+
+
+class TimedTemplate(jinja2.Template):
+    """
+    A template that reports how long it took to render.
+
+    Only templates rendered directly are timed. Included templates and
+    macros are part of the template that uses them.
+    """
+
+    def render(self, *args, **kwargs) -> str:
+        start = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            duration = time.perf_counter() - start
+            if duration >= settings.TEMPLATE_SLOW_RENDER_SECONDS:
+                logger.warning("Rendering %s took %.3fs", self.name, duration)
+            else:
+                logger.debug("Rendering %s took %.3fs", self.name, duration)
+            template_rendered.send(
+                sender=self.__class__, template_name=self.name, duration=duration
+            )
+
+
+class Environment(jinja2.Environment):
+    template_class = TimedTemplate
+
+
+class FileSystemBytecodeCache(jinja2.FileSystemBytecodeCache):
+    """
+    Stores compiled templates in JINJA_BYTECODE_CACHE_DIR, so they're shared
+    by all processes and only need to be compiled once per deployment.
+
+    Entries are keyed by the template source, so changed templates are
+    compiled again. Pre-warm the cache with the compiletemplates command.
+    """
+
+    def __init__(self, name: str):
+        directory = Path(settings.JINJA_BYTECODE_CACHE_DIR) / name
+        directory.mkdir(parents=True, exist_ok=True)
+        super().__init__(str(directory))
@@ -18,6 +18,7 @@ class CachedManifest:
     def __init__(self, path: Path):
         self._path = path
         self._value = None
+        self._html: dict[str, str] = {}
         self._last_update = datetime.datetime.now()
 
     @property
@@ -35,8 +36,21 @@ class CachedManifest:
         if self._should_update():
             with open(self._path) as manifest:
                 self._value = json.load(manifest)
+            self._html = {}
+            self._last_update = datetime.datetime.now()
         return self._value
 
+    def get_html(self, entrypoint: str) -> str:
+        """The asset tags of an entrypoint, built once per manifest version."""
+        manifest = self.get()
+        try:
+            return self._html[entrypoint]
+        except KeyError:
+            html = self._html[entrypoint] = "\n".join(
+                _manifest_entry_tags(manifest[entrypoint])
+            )
+            return html
+
 
 _MANIFEST = CachedManifest(settings.VITE_MANIFEST)
 
@@ -67,6 +81,21 @@ def _is_port_open(port: int, host: str = "localhost") -> bool:
         return False
 
 
+_asset_source: Optional[AssetSource] = None
+
+
+def get_asset_source() -> AssetSource:
+    """
+    Determine the asset source once per process. Only in debug mode it's
+    checked again for every render, as the Vite dev server might have been
+    started or stopped in the meantime.
+    """
+    global _asset_source
+    if _asset_source is None or settings.DEBUG:
+        _asset_source = _determine_asset_source()
+    return _asset_source
+
+
 def _determine_asset_source() -> AssetSource:
     is_vite_port_open = _is_port_open(settings.VITE_PORT, settings.VITE_HOST)
     manifest_exists = _MANIFEST.exists
@@ -130,23 +159,21 @@ def _script(asset_url: str, prefix=True):
     return f"<script type='module' src='{url}'></script>"
 
 
+def _manifest_entry_tags(entry: dict):
+    file = entry["file"]
+    yield _stylesheet(file) if file.endswith(".css") else _script(file)
+    if "css" in entry:
+        for style in entry["css"]:
+            yield _stylesheet(style)
+
+
 def get_asset_html(entrypoint: str | None = None):
     entrypoint = entrypoint if entrypoint is not None else settings.VITE_ENTRYPOINT
 
-    def _gen():
-        asset_source = _determine_asset_source()
-        host = settings.VITE_PUBLIC_HOST
-        port = settings.VITE_PORT
-        if asset_source is AssetSource.LIVE_SERVER:
-            origin = f"http://{host}:{port}"
-            yield _script(f"{origin}/{entrypoint}", prefix=False)
-        elif asset_source is AssetSource.MANIFEST:
-            manifest = _MANIFEST.get()
-            main = manifest[entrypoint]
-            file = main["file"]
-            yield _stylesheet(file) if file.endswith(".css") else _script(file)
-            if "css" in main:
-                for style in main["css"]:
-                    yield _stylesheet(style)
-
-    return "\n".join(_gen())
+    asset_source = get_asset_source()
+    if asset_source is AssetSource.LIVE_SERVER:
+        origin = f"http://{settings.VITE_PUBLIC_HOST}:{settings.VITE_PORT}"
+        return _script(f"{origin}/{entrypoint}", prefix=False)
+    elif asset_source is AssetSource.MANIFEST:
+        return _MANIFEST.get_html(entrypoint)
+    return ""
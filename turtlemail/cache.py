@@ -0,0 +1,132 @@
+"""
+Caching of expensive computations with versioned keys.
+
+Values are cached under a key including the versions of the data they were
+computed from, like ("chats", user_id) for the chat list of a user. Changing
+that data bumps the versions, so outdated values are never read again and
+simply expire. Saving and deleting models is handled in turtlemail.signals,
+code changing packets or their routes with queryset updates calls
+invalidate_packets() itself.
+"""
+
+import uuid
+from typing import Callable, Iterable, TypeVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+T = TypeVar("T")
+Scope = tuple[str | int, ...]
+
+_MISSING = object()
+
+
+def _version_key(scope: Scope) -> str:
+    return "version:" + ":".join(str(part) for part in scope)
+
+
+def _bump(scopes: Iterable[Scope]):
+    cache.set_many(
+        {_version_key(scope): uuid.uuid4().hex for scope in scopes}, timeout=None
+    )
+
+
+def get_versions(scopes: Iterable[Scope]) -> list[str]:
+    keys = [_version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    # Versions may have been evicted. Starting over with new ones makes
+    # sure values computed for an earlier version aren't used anymore.
+    missing = {key: uuid.uuid4().hex for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def cached(key: Scope, scopes: Iterable[Scope], compute: Callable[[], T]) -> T:
+    """
+    Get the value cached under key for the current versions of scopes,
+    or compute and cache it.
+    """
+    versions = get_versions(scopes)
+    cache_key = ":".join(str(part) for part in (*key, *versions))
+    value = cache.get(cache_key, _MISSING)
+    if value is _MISSING:
+        value = compute()
+        cache.set(cache_key, value, settings.CACHE_FRAGMENT_TIMEOUT)
+    return value
+
+
+def invalidate(*scopes: Scope):
+    """
+    Bump the versions of scopes. Within a transaction they're bumped again
+    once it's committed, as others might have cached values computed from
+    the data before the commit in the meantime.
+    """
+    if not scopes:
+        return
+    _bump(scopes)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _bump(scopes))
+
+
+def packet_scopes(packet_ids: Iterable[int]) -> list[Scope]:
+    """The scopes of everything cached about packets and the users involved."""
+    from turtlemail.models import Packet, RouteStep
+
+    packet_ids = list(packet_ids)
+    if not packet_ids:
+        return []
+    packets = Packet.objects.filter(pk__in=packet_ids)
+    user_ids = {
+        user_id
+        for (user_id,) in packets.values_list("sender_id").union(
+            packets.values_list("recipient_id"),
+            RouteStep.objects.filter(packet_id__in=packet_ids)
+            .order_by()
+            .values_list("stay__user_id"),
+        )
+        if user_id is not None
+    }
+    return [
+        ("packets",),
+        *(("packet", packet_id) for packet_id in packet_ids),
+        *(("deliveries", user_id) for user_id in user_ids),
+        *(("chats", user_id) for user_id in user_ids),
+    ]
+
+
+def invalidate_packets(*packet_ids: int):
+    """
+    Invalidate everything cached about packets and the users involved once
+    the current transaction is committed, so call it after all writes.
+    """
+    transaction.on_commit(lambda: invalidate(*packet_scopes(packet_ids)))
+
+
+def invalidate_deleted_packets(*packet_ids: int):
+    """
+    Like invalidate_packets() for packets or routes about to be deleted.
+    The users involved are looked up right away, while they can still be
+    found.
+    """
+    scopes = packet_scopes(packet_ids)
+    transaction.on_commit(lambda: invalidate(*scopes))
+
+
+def invalidate_chat(route_step_id: int):
+    """Invalidate the chat lists of both participants of a chat."""
+    from turtlemail.models import RouteStep
+
+    participants = RouteStep.objects.filter(pk=route_step_id).values_list(
+        "stay__user_id", "next_step__stay__user_id"
+    )
+    invalidate(
+        *(
+            ("chats", user_id)
+            for user_ids in participants
+            for user_id in user_ids
+            if user_id is not None
+        )
+    )
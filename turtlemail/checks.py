@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core import checks
+
+
+@checks.register(checks.Tags.security)
+def check_human_id_key(app_configs, **kwargs):
+    if settings.HUMAN_ID_KEY:
+        return []
+    return [
+        checks.Error(
+            "HUMAN_ID_KEY is not set.",
+            hint="Set it to a random string that never changes afterwards, "
+            "the codes of packets are derived from it.",
+            id="turtlemail.E001",
+        )
+    ]
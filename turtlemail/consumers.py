@@ -1,28 +1,48 @@
 import json
+from asgiref.sync import sync_to_async
 from django.utils.html import escape
-from django.core import serializers
-from django.template.loader import get_template
-from asgiref.sync import async_to_sync
-from channels.generic.websocket import WebsocketConsumer
+from django.template.loader import get_template, render_to_string
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
 
+from turtlemail import metrics
+from turtlemail.notification_service import NotificationService
 from turtlemail.views import ChatsView
-from .models import ChatMessage, RouteStep, UserChatMessage
+from .models import RouteStep, UserChatMessage
 
 
-class ChatConsumer(WebsocketConsumer):
+def user_group_name(user_id: int) -> str:
+    """Channel group of all sockets a user has open."""
+    return f"user_{user_id}"
+
+
+class ChatConsumer(AsyncWebsocketConsumer):
+    """
+    Chat between the two users of a route step.
+
+    Consumers run on the event loop, so everything touching the
+    database (including lazy relations used while rendering templates)
+    happens in the database_sync_to_async methods below.
+    """
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.user = None
         self.step = None
         self.group_name = None
+        self.accepted = False
 
-    def connect(self):
-        self.step_id = self.scope["url_route"]["kwargs"]["step_id"]
+    @database_sync_to_async
+    def get_step(self, step_id: int) -> RouteStep:
         # the deeply nested data model is very slow to query.
         # For the request intensive messaging functionality we should at least prefetch (sql join).
-        self.step = RouteStep.objects.select_related(
+        return RouteStep.objects.select_related(
             "stay__user", "next_step__stay__user"
-        ).get(id=self.step_id)
+        ).get(id=step_id)
+
+    async def connect(self):
+        self.step_id = self.scope["url_route"]["kwargs"]["step_id"]
+        self.step = await self.get_step(self.step_id)
         self.group_name = f"chat_{str(self.step.pk)}"
         self.user = self.scope["user"]
 
@@ -31,31 +51,46 @@ class ChatConsumer(WebsocketConsumer):
             self.step.stay.user == self.user
             or self.step.next_step.stay.user == self.user
         ):
-            self.accept()
+            await self.accept()
+            self.accepted = True
+            # storing metrics might block on redis, keep it off the event loop
+            await sync_to_async(metrics.OPEN_SOCKETS.inc, thread_sensitive=False)()
 
             # join the chat + channel group
             # group of both communicating parties
-            async_to_sync(self.channel_layer.group_add)(
-                self.group_name, self.channel_name
+            await self.channel_layer.group_add(self.group_name, self.channel_name)
+            # another group per user to transmit updates in their other chats
+            await self.channel_layer.group_add(
+                user_group_name(self.user.pk), self.channel_name
             )
-            # another group for everybody to transmit updates in other chats
-            async_to_sync(self.channel_layer.group_add)("all", self.channel_name)
 
         # # user joined notification
         # html = get_template("partial/join.html").render(context={"user":self.user})
         # self.send(text_data=html)
 
-    def disconnect(self, code):
-        async_to_sync(self.channel_layer.group_discard)(
-            self.group_name, self.channel_name
-        )
+    async def disconnect(self, code):
+        if self.accepted:
+            await sync_to_async(metrics.OPEN_SOCKETS.dec, thread_sensitive=False)()
+        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        if self.user is not None:
+            await self.channel_layer.group_discard(
+                user_group_name(self.user.pk), self.channel_name
+            )
         # html = get_template("partial/leave.html").render(context={"user":self.user})
         # self.send(
         #     text_data=html
         # )
         # self.room.online.remove(self.user)
 
-    def receive(self, text_data=None, bytes_data=None):
+    @database_sync_to_async
+    def create_message(self, content: str) -> dict:
+        """Store a new message and return the event announcing it."""
+        message = UserChatMessage.objects.create(
+            author=self.user, route_step=self.step, content=content
+        )
+        return NotificationService.chat_message_event(message)
+
+    async def receive(self, text_data=None, bytes_data=None):
         """
         client pushes message over ws
         """
@@ -72,94 +107,68 @@ class ChatConsumer(WebsocketConsumer):
         if not content:
             return
         # write message to db
-        message = UserChatMessage.objects.create(
-            author=self.user, route_step=self.step, content=content
-        )
+        event = await self.create_message(content)
+        await sync_to_async(metrics.CHAT_MESSAGES.inc, thread_sensitive=False)()
         # send message to sender and receiver (if sender has networking issues the message will not appear in the client)
-        async_to_sync(self.channel_layer.group_send)(
-            self.group_name,
-            {
-                "type": "chat_message",
-                "message": serializers.serialize(
-                    "json", [message, message.chatmessage_ptr]
-                ),
-                "index": ChatMessage.objects.filter(route_step=self.step).count(),
-                "update": False,
-            },
-        )
-        # inform everybody about update in room (we filter authorized recipients in called function)
-        async_to_sync(self.channel_layer.group_send)(
-            "all",
-            {
-                "type": "update_chat_list_item",
-                "step": serializers.serialize(
-                    "json",
-                    [
-                        self.step,
-                    ],
-                )[1:-1],
-            },
-        )
+        await self.channel_layer.group_send(self.group_name, event)
+        # inform both parties about the update in their other open chats
+        for user in (self.step.stay.user, self.step.next_step.stay.user):
+            await self.channel_layer.group_send(
+                user_group_name(user.pk),
+                {
+                    "type": "update_chat_list_item",
+                    "step_id": self.step.pk,
+                },
+            )
+
+    @database_sync_to_async
+    def mark_read(self):
+        NotificationService.notify_messages_read(self.user, self.step)
 
-    def chat_message(self, event):
+    async def chat_message(self, event):
         """
-        add or replace chat message to all involved parties
+        add chat message to all involved parties
         """
-        generator = serializers.deserialize("json", event["message"])
-        message = next(generator).object
-        message_parent = next(generator).object
-        message.chatmessage_ptr = message_parent
-        message.created_at = message_parent.created_at
-        message.route_step = message_parent.route_step
-        message.status = message_parent.status
-        html = get_template("turtlemail/_chat_message.jinja").render(
-            context={
-                "msg": message,
-                "new_msg": not event["update"],
-                "update_msg": event["update"],
-                "user": self.user,
-                "index": event["index"],
-            }
-        )
-        if not event["update"] or self.user == message.author:
-            self.send(text_data=html)
+        is_author = self.user.pk == event["author_id"]
+        await self.send(text_data=event["html"]["own" if is_author else "other"])
         # message receipt
-        if self.user != message.author and message.status in (
+        if not is_author and event["status"] in (
             UserChatMessage.StatusChoices.NEW,
             UserChatMessage.StatusChoices.NOTIFIED,
         ):
-            index = ChatMessage.objects.filter(route_step=self.step).count()
-            message.status = UserChatMessage.StatusChoices.RECEIVED
-            message.save()
-            async_to_sync(self.channel_layer.group_send)(
-                self.group_name,
-                {
-                    "type": "chat_message",
-                    "message": serializers.serialize(
-                        "json", [message, message.chatmessage_ptr]
-                    ),
-                    "index": index,
-                    "update": True,
-                },
-            )
+            await self.mark_read()
 
-    def update_chat_list_item(self, event):
+    async def messages_read(self, event):
         """
-        inform clients about updates in chats, that they are not actively reading
+        show the receipts of messages the other party has read
         """
-        step = next(serializers.deserialize("json", "[" + event["step"] + "]")).object
-        # does this broadcast concern us?
-        if (
-            self.user != step.stay.user and self.user != step.next_step.stay.user
-        ) or self.step == step:
-            # no? do nothing
+        if self.user.pk == event["reader_id"]:
             return
+        html = render_to_string(
+            "turtlemail/_chat_receipts.jinja", {"sequences": event["sequences"]}
+        )
+        await self.send(text_data=html)
+
+    @database_sync_to_async
+    def render_chat_list_item(self, event) -> str:
+        step = RouteStep.objects.select_related(
+            "stay__user", "next_step__stay__user"
+        ).get(id=event["step_id"])
         # let's swap the list item (even if swapped already) This is traffic vs db load here.
         chat = ChatsView.get_chat_context(step, self.user, updated=True)
-        html = get_template("turtlemail/_chat_list_item.jinja").render(
+        return get_template("turtlemail/_chat_list_item.jinja").render(
             context={
                 "chat": chat,
                 "htmx": True,
             }
         )
-        self.send(text_data=html)
+
+    async def update_chat_list_item(self, event):
+        """
+        inform clients about updates in chats, that they are not actively reading
+        """
+        # this chat is open already and gets the message itself
+        if event["step_id"] == self.step.pk:
+            return
+        html = await self.render_chat_list_item(event)
+        await self.send(text_data=html)
@@ -3,7 +3,6 @@ from typing import Any
 
 from django import forms
 from django.conf import settings
-from django.core.mail import send_mail
 from django.db import models
 from django.contrib.auth.forms import (
     AuthenticationForm as _AuthenticationForm,
@@ -20,6 +19,7 @@ from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 
 from turtlemail import widgets
+from turtlemail.outbox import queue_mail
 
 from .models import Invite, Location, Route, RouteStep, Stay, User, UserSettings
 
@@ -341,7 +341,7 @@ class RouteStepRoutingForm(forms.Form):
                         "problem_description": self.cleaned_data["problem_description"],
                     },
                 )
-                send_mail(
+                queue_mail(
                     subject="User reported a problem with a turtlemail devliery",
                     message=mail_text,
                     from_email=None,
@@ -1,9 +1,12 @@
+import hashlib
+import hmac
+import math
 import random
 import itertools
 from typing import Union
 from . import dictionary
 
-__all__ = ["generate_id"]
+__all__ = ["generate_id", "encode", "decode"]
 
 system_random = random.SystemRandom()
 SeedableType = Union[type(None), int, float, str, bytes, bytearray]
@@ -39,3 +42,105 @@ def generate_id(separator="-", seed: SeedableType = None, word_count=4) -> str:
     )
 
     return separator.join(parts)
+
+
+def _words(words, exclude=()) -> tuple:
+    # Without duplicates and words containing the separator, a word tuple
+    # can be split and decoded unambiguously.
+    return tuple(
+        word for word in dict.fromkeys(words) if "-" not in word and word not in exclude
+    )
+
+
+# Encoded IDs are adjective-adjective-color-noun. Random IDs from
+# generate_id() always start with a color, so they never collide.
+# The order of the dictionary must not change anymore, it would change
+# the encoding of every number.
+_PARTS = (
+    _words(dictionary.adjectives, exclude=dictionary.colors),
+    _words(dictionary.adjectives, exclude=dictionary.colors),
+    _words(dictionary.colors),
+    _words(dictionary.nouns),
+)
+_INDICES = tuple({word: index for index, word in enumerate(part)} for part in _PARTS)
+
+ID_COUNT = math.prod(len(part) for part in _PARTS)
+
+# The numbers are permuted by a balanced Feistel network on the smallest
+# even number of bits that fits ID_COUNT. Results outside of the range are
+# permuted again (cycle walking) until they fit, which keeps it a bijection.
+_HALF_BITS = ((ID_COUNT - 1).bit_length() + 1) // 2
+_HALF_MASK = (1 << _HALF_BITS) - 1
+_ROUNDS = range(4)
+
+
+def _round(key: bytes, round: int, half: int) -> int:
+    digest = hmac.new(
+        key, bytes([round]) + half.to_bytes(8, "big"), hashlib.sha256
+    ).digest()
+    return int.from_bytes(digest[:8], "big") & _HALF_MASK
+
+
+def _feistel(number: int, key: bytes, rounds: range) -> int:
+    left, right = number >> _HALF_BITS, number & _HALF_MASK
+    for round in rounds:
+        left, right = right, left ^ _round(key, round, right)
+    return (right << _HALF_BITS) | left
+
+
+def _permute(number: int, key: bytes, rounds: range) -> int:
+    number = _feistel(number, key, rounds)
+    while number >= ID_COUNT:
+        number = _feistel(number, key, rounds)
+    return number
+
+
+def encode(number: int, key: Union[str, bytes], separator="-") -> str:
+    """
+    Encode a number as a human readable ID
+
+    Every number below ID_COUNT gets a different ID, and the IDs of
+    consecutive numbers look unrelated to anyone who doesn't know the key.
+
+    :param number: The number to encode, e.g. a primary key
+    :param key: The secret key of the permutation
+    :param separator: The string to use to separate words
+    :return: A human readable ID
+    """
+    if not 0 <= number < ID_COUNT:
+        raise ValueError(f"number must be between 0 and {ID_COUNT - 1}")
+    if isinstance(key, str):
+        key = key.encode()
+
+    number = _permute(number, key, _ROUNDS)
+    words = []
+    for part in reversed(_PARTS):
+        number, index = divmod(number, len(part))
+        words.append(part[index])
+    return separator.join(reversed(words))
+
+
+def decode(human_id: str, key: Union[str, bytes], separator="-") -> int:
+    """
+    Decode an ID created by encode() back to the number
+
+    :param human_id: The human readable ID
+    :param key: The secret key used to encode it
+    :param separator: The string used to separate words
+    :return: The encoded number
+    """
+    words = human_id.split(separator)
+    if len(words) != len(_PARTS):
+        raise ValueError(f"{human_id!r} is not an encoded ID")
+    number = 0
+    for word, part, indices in zip(words, _PARTS, _INDICES):
+        try:
+            number = number * len(part) + indices[word]
+        except KeyError:
+            raise ValueError(f"{human_id!r} is not an encoded ID") from None
+    if isinstance(key, str):
+        key = key.encode()
+
+    # The inverse of a Feistel network runs the rounds in reverse order
+    # with the halves swapped, which _feistel() does on both ends.
+    return _permute(number, key, _ROUNDS[::-1])
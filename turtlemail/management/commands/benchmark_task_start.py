@@ -0,0 +1,39 @@
+import statistics
+import time
+
+from django.core.management import BaseCommand
+from django.db import connection
+
+from turtlemail.util import ensure_database_connection
+
+
+@ensure_database_connection
+def _task():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure how long it takes to start a background task that uses the "
+        "database. Compare runs with DATABASE_CONN_MAX_AGE=0 and =600."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=100)
+
+    def handle(self, *args, runs: int, **options):
+        connection.close()
+        durations = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            _task()
+            durations.append((time.perf_counter() - start) * 1000)
+
+        self.stdout.write(
+            f"CONN_MAX_AGE={connection.settings_dict['CONN_MAX_AGE']} "
+            f"CONN_HEALTH_CHECKS={connection.settings_dict['CONN_HEALTH_CHECKS']}\n"
+            f"first run: {durations[0]:.2f} ms\n"
+            f"median: {statistics.median(durations):.2f} ms\n"
+            f"mean: {statistics.mean(durations):.2f} ms"
+        )
@@ -0,0 +1,26 @@
+from django.core.management import BaseCommand, CommandError
+from django.template import engines
+from django_jinja.backend import Jinja2
+import jinja2
+
+
+class Command(BaseCommand):
+    help = "Compile all Jinja templates into the bytecode cache"
+
+    def handle(self, *args, **options):
+        for engine in engines.all():
+            if not isinstance(engine, Jinja2):
+                continue
+            if engine.env.bytecode_cache is None:
+                raise CommandError("The Jinja bytecode cache is disabled.")
+
+            extension = engine.match_extension or ""
+            names = engine.env.list_templates(
+                filter_func=lambda name, extension=extension: name.endswith(extension)
+            )
+            for name in names:
+                try:
+                    engine.env.get_template(name)
+                except jinja2.TemplateSyntaxError as e:
+                    raise CommandError(f"Could not compile {name}: {e}") from e
+            self.stdout.write(f"Compiled {len(names)} templates.")
@@ -0,0 +1,10 @@
+from django.core.management import BaseCommand
+from turtlemail.models import UnreadChatCounter
+
+
+class Command(BaseCommand):
+    help = "Recompute the unread chat message counters from the chat messages"
+
+    def handle(self, *args, **options):
+        counters = UnreadChatCounter.recompute()
+        self.stdout.write(f"Recomputed {counters} unread chat message counters.")
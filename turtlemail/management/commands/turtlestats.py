@@ -1,7 +1,9 @@
+import datetime
 import json
 
 from django.core.management import BaseCommand
 from turtlemail import stats
+from turtlemail.cache import cached
 
 
 class Command(BaseCommand):
@@ -11,13 +13,28 @@ class Command(BaseCommand):
             action="store_true",
             help="Load demo data instead of development data",
         )
+        parser.add_argument(
+            "--since",
+            type=datetime.date.fromisoformat,
+            help="Return the daily statistics from this date (YYYY-MM-DD) on",
+        )
+        parser.add_argument(
+            "--until",
+            type=datetime.date.fromisoformat,
+            help="Return the daily statistics up to this date (YYYY-MM-DD)",
+        )
 
     def handle(self, *args, **options):
-        data = {
-            "accounts": stats.get_account_stats(),
-            "packets": stats.get_packet_stats(),
-            "stays": stats.get_stay_stats(),
-        }
+        if options["since"] or options["until"]:
+            data = {"days": stats.get_daily_stats(options["since"], options["until"])}
+        else:
+            data = {
+                "accounts": stats.get_account_stats(),
+                "packets": cached(
+                    ("turtlestats", "packets"), [("packets",)], stats.get_packet_stats
+                ),
+                "stays": stats.get_stay_stats(),
+            }
         self.stdout.write(
             json.dumps(data, indent=4, sort_keys=True, ensure_ascii=False),
         )
@@ -0,0 +1,350 @@
+"""
+Counters, gauges and histograms in the Prometheus text format.
+
+Web workers, websocket workers and huey run in separate processes (and
+containers), so samples are kept in Redis if the cache uses it, and add up
+across all of them. Otherwise, like in tests, every process keeps its own.
+Recording a sample never raises, it's only logged if storing it failed.
+"""
+
+import json
+import logging
+import math
+import os
+import socket
+import threading
+from typing import Iterable
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_KEY_PREFIX = "turtlemail:metrics:"
+_REGISTRY: list["Metric"] = []
+
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class _LocalStorage:
+    def __init__(self):
+        self._values: dict[str, dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, key: str, increments: dict[str, float]):
+        with self._lock:
+            values = self._values.setdefault(key, {})
+            for field, amount in increments.items():
+                values[field] = values.get(field, 0) + amount
+
+    def set(self, key: str, field: str, value: float):
+        with self._lock:
+            self._values.setdefault(key, {})[field] = value
+
+    def get_all(self, keys: list[str]) -> list[dict[str, float]]:
+        with self._lock:
+            return [dict(self._values.get(key, {})) for key in keys]
+
+    def remove(self, key: str, fields: list[str]):
+        with self._lock:
+            values = self._values.get(key, {})
+            for field in fields:
+                values.pop(field, None)
+
+
+class _RedisStorage:
+    def __init__(self, url: str):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+
+    def add(self, key: str, increments: dict[str, float]):
+        with self._client.pipeline(transaction=False) as pipeline:
+            for field, amount in increments.items():
+                pipeline.hincrbyfloat(key, field, amount)
+            pipeline.execute()
+
+    def set(self, key: str, field: str, value: float):
+        self._client.hset(key, field, value)
+
+    def get_all(self, keys: list[str]) -> list[dict[str, float]]:
+        with self._client.pipeline(transaction=False) as pipeline:
+            for key in keys:
+                pipeline.hgetall(key)
+            return [
+                {field.decode(): float(value) for field, value in values.items()}
+                for values in pipeline.execute()
+            ]
+
+    def remove(self, key: str, fields: list[str]):
+        if fields:
+            self._client.hdel(key, *fields)
+
+
+_storage = None
+
+
+def _get_storage():
+    global _storage
+    if _storage is None:
+        cache = settings.CACHES.get("default", {})
+        if cache.get("BACKEND") == "django.core.cache.backends.redis.RedisCache":
+            _storage = _RedisStorage(cache["LOCATION"])
+        else:
+            _storage = _LocalStorage()
+    return _storage
+
+
+def _field(sample: str, labels: dict[str, str]) -> str:
+    return json.dumps([sample, sorted(labels.items())])
+
+
+def _process() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    return repr(float(value))
+
+
+def _format_sample(name: str, labels: Iterable[tuple[str, str]], value: float) -> str:
+    label_text = ",".join(
+        '{}="{}"'.format(
+            label,
+            str(label_value)
+            .replace("\\", "\\\\")
+            .replace('"', '\\"')
+            .replace("\n", "\\n"),
+        )
+        for label, label_value in labels
+    )
+    if label_text:
+        return f"{name}{{{label_text}}} {_format_value(value)}"
+    return f"{name} {_format_value(value)}"
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.key = _KEY_PREFIX + name
+        _REGISTRY.append(self)
+
+    def _labels(self, labels: dict[str, str]) -> dict[str, str]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects the labels {self.labelnames}")
+        return {label: str(value) for label, value in labels.items()}
+
+    def _add(self, increments: dict[str, float]):
+        try:
+            _get_storage().add(self.key, increments)
+        except Exception as e:
+            logger.warning("Could not record %s: %s", self.name, e)
+
+    def _samples(self, values: dict[str, float]) -> list[str]:
+        return [
+            _format_sample(sample, labels, value)
+            for sample, labels, value in sorted(
+                (*json.loads(field), value) for field, value in values.items()
+            )
+        ]
+
+    def expose(self, values: dict[str, float]) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+            *self._samples(values),
+        ]
+
+
+class Counter(Metric):
+    """A value that only goes up. The name should end with _total."""
+
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels: str):
+        self._add({_field(self.name, self._labels(labels)): amount})
+
+
+class Gauge(Metric):
+    """
+    A value that goes up and down.
+
+    With per_process, every process keeps its own value, and they're added
+    up when exposed. A process calls reset() when it starts, so whatever a
+    previous process with the same host name and pid left behind (e.g.
+    after a crash) doesn't count anymore.
+    """
+
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        per_process: bool = False,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.per_process = per_process
+
+    def _gauge_field(self, labels: dict[str, str]) -> str:
+        labels = self._labels(labels)
+        if self.per_process:
+            return json.dumps([self.name, sorted(labels.items()), _process()])
+        return _field(self.name, labels)
+
+    def inc(self, amount: float = 1, **labels: str):
+        self._add({self._gauge_field(labels): amount})
+
+    def dec(self, amount: float = 1, **labels: str):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str):
+        try:
+            _get_storage().set(self.key, self._gauge_field(labels), value)
+        except Exception as e:
+            logger.warning("Could not record %s: %s", self.name, e)
+
+    def reset(self):
+        """Remove the values of the current process."""
+        if not self.per_process:
+            return
+        process = _process()
+        try:
+            storage = _get_storage()
+            (values,) = storage.get_all([self.key])
+            storage.remove(
+                self.key,
+                [field for field in values if json.loads(field)[2] == process],
+            )
+        except Exception as e:
+            logger.warning("Could not reset %s: %s", self.name, e)
+
+    def _samples(self, values: dict[str, float]) -> list[str]:
+        if not self.per_process:
+            return super()._samples(values)
+        totals: dict[str, float] = {}
+        for field, value in values.items():
+            sample, labels, _pid = json.loads(field)
+            total_field = _field(sample, dict(labels))
+            totals[total_field] = totals.get(total_field, 0) + value
+        return super()._samples(totals)
+
+
+class Histogram(Metric):
+    """Counts observed values in buckets, e.g. durations in seconds."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = (*sorted(buckets), math.inf)
+
+    def observe(self, value: float, **labels: str):
+        labels = self._labels(labels)
+        # Only the bucket the value falls into is stored, they're added up
+        # to the cumulative counts when exposed.
+        bucket = next(bound for bound in self.buckets if value <= bound)
+        self._add(
+            {
+                _field(
+                    f"{self.name}_bucket", {**labels, "le": _format_value(bucket)}
+                ): 1,
+                _field(f"{self.name}_sum", labels): value,
+                _field(f"{self.name}_count", labels): 1,
+            }
+        )
+
+    def _samples(self, values: dict[str, float]) -> list[str]:
+        buckets: dict[tuple, dict[str, float]] = {}
+        others = {}
+        for field, value in values.items():
+            sample, labels = json.loads(field)
+            if sample != f"{self.name}_bucket":
+                others[field] = value
+                continue
+            labels = dict(labels)
+            le = labels.pop("le")
+            buckets.setdefault(tuple(sorted(labels.items())), {})[le] = value
+
+        lines = []
+        for labels, counts in sorted(buckets.items()):
+            cumulative = 0.0
+            for bound in self.buckets:
+                cumulative += counts.get(_format_value(bound), 0)
+                lines.append(
+                    _format_sample(
+                        f"{self.name}_bucket",
+                        [*labels, ("le", _format_value(bound))],
+                        cumulative,
+                    )
+                )
+        return lines + super()._samples(others)
+
+
+def expose() -> str:
+    """All metrics in the Prometheus text format."""
+    values = _get_storage().get_all([metric.key for metric in _REGISTRY])
+    lines = []
+    for metric, metric_values in zip(_REGISTRY, values, strict=True):
+        lines.extend(metric.expose(metric_values))
+    return "\n".join(lines) + "\n"
+
+
+ROUTE_SEARCH_DURATION = Histogram(
+    "turtlemail_route_search_duration_seconds",
+    "Time it took to search for a route",
+)
+ROUTE_SEARCH_EXPANDED_NODES = Histogram(
+    "turtlemail_route_search_expanded_nodes",
+    "Number of stays visited while searching for a route",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000),
+)
+ROUTE_SEARCHES = Counter(
+    "turtlemail_route_searches_total",
+    "Route searches by result: found, not_found or no_starting_stay",
+    ["result"],
+)
+ROUTE_CREATION_ERRORS = Counter(
+    "turtlemail_route_creation_errors_total",
+    "Errors while searching for a route or storing it",
+)
+ROUTING_BACKLOG = Gauge(
+    "turtlemail_routing_backlog_packets",
+    "Packets without a valid route at the last routing run",
+)
+TASK_DURATION = Histogram(
+    "turtlemail_task_duration_seconds",
+    "Run time of background tasks",
+    ["task", "outcome"],
+)
+TASK_OVERRUNS = Counter(
+    "turtlemail_task_overruns_total",
+    "Background task runs skipped because the previous run was still going",
+    ["task"],
+)
+EMAILS = Counter(
+    "turtlemail_emails_total",
+    "Emails handled by the outbox by result: sent, retry or failed",
+    ["result"],
+)
+OPEN_SOCKETS = Gauge(
+    "turtlemail_open_websockets",
+    "Websocket connections currently open",
+    per_process=True,
+)
+CHAT_MESSAGES = Counter(
+    "turtlemail_chat_messages_total",
+    "Chat messages sent through websockets",
+)
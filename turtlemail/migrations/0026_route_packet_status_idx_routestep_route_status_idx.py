@@ -0,0 +1,24 @@
+# Generated by Django 4.2.13 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("turtlemail", "0025_packet_is_cancelled"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="route",
+            index=models.Index(
+                fields=["packet", "status"], name="turtlemail__packet__20a9b0_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="routestep",
+            index=models.Index(
+                fields=["route", "status"], name="turtlemail__route_i_df6a7d_idx"
+            ),
+        ),
+    ]
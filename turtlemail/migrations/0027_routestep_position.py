@@ -0,0 +1,40 @@
+# Generated by Django 4.2.13 on 2026-10-19 12:30
+
+from django.db import migrations, models
+
+
+def set_route_step_positions(apps, schema_editor):
+    RouteStep = apps.get_model("turtlemail", "RouteStep")
+
+    steps = RouteStep.objects.only("id", "previous_step_id", "next_step_id")
+    steps_by_id = {step.id: step for step in steps}
+    to_update = []
+    for step in steps_by_id.values():
+        if step.previous_step_id is not None:
+            continue
+        # Walk the linked list from the first step of every route
+        position = 0
+        while step is not None:
+            step.position = position
+            to_update.append(step)
+            position += 1
+            step = steps_by_id.get(step.next_step_id)
+
+    RouteStep.objects.bulk_update(to_update, ["position"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("turtlemail", "0026_route_packet_status_idx_routestep_route_status_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="routestep",
+            name="position",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Position in route"
+            ),
+        ),
+        migrations.RunPython(set_route_step_positions, migrations.RunPython.noop),
+    ]
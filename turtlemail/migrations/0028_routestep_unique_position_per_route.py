@@ -0,0 +1,18 @@
+# Generated by Django 4.2.13 on 2026-10-19 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("turtlemail", "0027_routestep_position"),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name="routestep",
+            constraint=models.UniqueConstraint(
+                fields=("route", "position"), name="unique_position_per_route"
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.13 on 2026-10-19 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("turtlemail", "0028_routestep_unique_position_per_route"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="deliverylog",
+            index=models.Index(
+                fields=["packet", "-created_at", "-id"],
+                name="turtlemail__packet__821872_idx",
+            ),
+        ),
+    ]
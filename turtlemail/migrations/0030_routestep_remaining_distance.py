@@ -0,0 +1,41 @@
+# Generated by Django 4.2.13 on 2026-10-19 15:00
+
+from itertools import groupby
+
+from django.db import migrations, models
+
+
+def set_remaining_distances(apps, schema_editor):
+    RouteStep = apps.get_model("turtlemail", "RouteStep")
+
+    steps = (
+        RouteStep.objects.select_related("stay__location")
+        .only("id", "route_id", "position", "stay__location__point")
+        .order_by("route_id", "position")
+    )
+    to_update = []
+    for _, route_steps in groupby(steps.iterator(), key=lambda step: step.route_id):
+        route_steps = list(route_steps)
+        destination = route_steps[-1].stay.location.point
+        for step in route_steps:
+            step.remaining_distance = step.stay.location.point.distance(destination)
+            to_update.append(step)
+
+    RouteStep.objects.bulk_update(to_update, ["remaining_distance"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("turtlemail", "0029_deliverylog_packet_created_at_id_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="routestep",
+            name="remaining_distance",
+            field=models.FloatField(
+                null=True, verbose_name="Remaining distance to destination"
+            ),
+        ),
+        migrations.RunPython(set_remaining_distances, migrations.RunPython.noop),
+    ]
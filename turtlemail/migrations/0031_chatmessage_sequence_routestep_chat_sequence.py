@@ -0,0 +1,63 @@
+# Generated by Django 4.2.13 on 2026-10-19 16:00
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce, RowNumber
+
+
+def set_chat_message_sequences(apps, schema_editor):
+    ChatMessage = apps.get_model("turtlemail", "ChatMessage")
+    RouteStep = apps.get_model("turtlemail", "RouteStep")
+
+    messages = ChatMessage.objects.annotate(
+        number=models.Window(
+            RowNumber(),
+            partition_by=[models.F("route_step_id")],
+            order_by=[models.F("created_at").asc(), models.F("id").asc()],
+        )
+    ).only("id")
+    to_update = []
+    for message in messages.iterator():
+        message.sequence = message.number
+        to_update.append(message)
+    ChatMessage.objects.bulk_update(to_update, ["sequence"], batch_size=1000)
+
+    last_sequence = (
+        ChatMessage.objects.filter(route_step=models.OuterRef("pk"))
+        .order_by()
+        .values("route_step")
+        .annotate(last=models.Max("sequence"))
+        .values("last")
+    )
+    RouteStep.objects.update(chat_sequence=Coalesce(models.Subquery(last_sequence), 0))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("turtlemail", "0030_routestep_remaining_distance"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="chatmessage",
+            options={
+                "ordering": ["route_step", "sequence"],
+                "verbose_name": "Chat message",
+                "verbose_name_plural": "Chat messages",
+            },
+        ),
+        migrations.AddField(
+            model_name="chatmessage",
+            name="sequence",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Number within the chat"
+            ),
+        ),
+        migrations.AddField(
+            model_name="routestep",
+            name="chat_sequence",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Number of the latest chat message"
+            ),
+        ),
+        migrations.RunPython(set_chat_message_sequences, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.13 on 2026-10-19 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("turtlemail", "0031_chatmessage_sequence_routestep_chat_sequence"),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name="chatmessage",
+            constraint=models.UniqueConstraint(
+                fields=("route_step", "sequence"),
+                name="unique_sequence_per_route_step",
+            ),
+        ),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 4.2.13 on 2026-10-19 17:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def count_unread_messages(apps, schema_editor):
+    RouteStep = apps.get_model("turtlemail", "RouteStep")
+    UserChatMessage = apps.get_model("turtlemail", "UserChatMessage")
+    UnreadChatCounter = apps.get_model("turtlemail", "UnreadChatCounter")
+
+    participants = {
+        step_id: (giver_id, taker_id)
+        for step_id, giver_id, taker_id in RouteStep.objects.filter(
+            next_step__isnull=False
+        ).values_list("id", "stay__user_id", "next_step__stay__user_id")
+    }
+    unread = (
+        UserChatMessage.objects.filter(status__in=("N", "NO"))
+        .order_by()
+        .values_list("route_step_id", "author_id")
+        .annotate(count=models.Count("pk"))
+    )
+    counts = {}
+    for route_step_id, author_id, count in unread:
+        for user_id in participants.get(route_step_id, ()):
+            if user_id != author_id:
+                key = (user_id, route_step_id)
+                counts[key] = counts.get(key, 0) + count
+
+    UnreadChatCounter.objects.bulk_create(
+        (
+            UnreadChatCounter(user_id=user_id, route_step_id=route_step_id, count=count)
+            for (user_id, route_step_id), count in counts.items()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("turtlemail", "0032_chatmessage_unique_sequence_per_route_step"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UnreadChatCounter",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Unread messages"
+                    ),
+                ),
+                (
+                    "route_step",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="unread_chat_counters",
+                        to="turtlemail.routestep",
+                        verbose_name="RouteStep context",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="unread_chat_counters",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="User",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Unread chat messages counter",
+                "verbose_name_plural": "Unread chat messages counters",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="unreadchatcounter",
+            constraint=models.UniqueConstraint(
+                fields=("user", "route_step"),
+                name="unique_unread_counter_per_user_and_route_step",
+            ),
+        ),
+        migrations.RunPython(count_unread_messages, migrations.RunPython.noop),
+    ]
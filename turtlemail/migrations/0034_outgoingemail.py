@@ -0,0 +1,78 @@
+# Generated by Django 4.2.13 on 2026-10-19 18:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("turtlemail", "0033_unreadchatcounter"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OutgoingEmail",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Datetime"),
+                ),
+                ("subject", models.TextField(verbose_name="Subject")),
+                ("body", models.TextField(verbose_name="Message")),
+                (
+                    "from_email",
+                    models.TextField(blank=True, null=True, verbose_name="Sender"),
+                ),
+                ("recipient", models.TextField(verbose_name="Recipient")),
+                (
+                    "status",
+                    models.TextField(
+                        choices=[
+                            ("PENDING", "Pending"),
+                            ("SENT", "Sent"),
+                            ("FAILED", "Failed"),
+                        ],
+                        default="PENDING",
+                        verbose_name="Status",
+                    ),
+                ),
+                (
+                    "attempts",
+                    models.PositiveIntegerField(default=0, verbose_name="Attempts"),
+                ),
+                (
+                    "next_attempt_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, verbose_name="Next attempt"
+                    ),
+                ),
+                (
+                    "sent_at",
+                    models.DateTimeField(blank=True, null=True, verbose_name="Sent at"),
+                ),
+                (
+                    "last_error",
+                    models.TextField(blank=True, default="", verbose_name="Last error"),
+                ),
+            ],
+            options={
+                "verbose_name": "Outgoing email",
+                "verbose_name_plural": "Outgoing emails",
+                "indexes": [
+                    models.Index(
+                        fields=["status", "next_attempt_at"],
+                        name="turtlemail__status_36c1c4_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 4.2.13 on 2026-10-19 19:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("turtlemail", "0034_outgoingemail"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="usersettings",
+            name="notification_digest_sent_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name="NotificationEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Datetime"),
+                ),
+                (
+                    "kind",
+                    models.TextField(
+                        choices=[
+                            ("CHAT_MESSAGE", "New chat messages"),
+                            ("ROUTING_REQUEST", "Open routing request"),
+                        ],
+                        verbose_name="Kind",
+                    ),
+                ),
+                (
+                    "route_step",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="notification_events",
+                        to="turtlemail.routestep",
+                        verbose_name="RouteStep context",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="notification_events",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="User",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Notification event",
+                "verbose_name_plural": "Notification events",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="notificationevent",
+            constraint=models.UniqueConstraint(
+                fields=("user", "route_step", "kind"),
+                name="unique_notification_event",
+            ),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 4.2.13 on 2026-10-19 20:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("turtlemail", "0035_notificationevent"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField(unique=True, verbose_name="Date")),
+                (
+                    "new_accounts",
+                    models.PositiveIntegerField(default=0, verbose_name="New accounts"),
+                ),
+                (
+                    "new_packets",
+                    models.PositiveIntegerField(default=0, verbose_name="New packets"),
+                ),
+                (
+                    "accounts",
+                    models.PositiveIntegerField(null=True, verbose_name="Accounts"),
+                ),
+                (
+                    "packets_waiting",
+                    models.PositiveIntegerField(
+                        null=True, verbose_name="Packets waiting"
+                    ),
+                ),
+                (
+                    "packets_in_transit",
+                    models.PositiveIntegerField(
+                        null=True, verbose_name="Packets in transit"
+                    ),
+                ),
+                (
+                    "packets_delivered",
+                    models.PositiveIntegerField(
+                        null=True, verbose_name="Packets delivered"
+                    ),
+                ),
+                (
+                    "stays_min",
+                    models.PositiveIntegerField(
+                        null=True, verbose_name="Minimum stays per user"
+                    ),
+                ),
+                (
+                    "stays_max",
+                    models.PositiveIntegerField(
+                        null=True, verbose_name="Maximum stays per user"
+                    ),
+                ),
+                (
+                    "stays_median",
+                    models.FloatField(null=True, verbose_name="Median stays per user"),
+                ),
+            ],
+            options={
+                "verbose_name": "Daily statistics",
+                "verbose_name_plural": "Daily statistics",
+            },
+        ),
+    ]
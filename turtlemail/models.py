@@ -1,11 +1,13 @@
+import functools
 import json
 import datetime
 from logging import debug
 import secrets
-from typing import TYPE_CHECKING, ClassVar, Set, Self, Tuple
+from typing import TYPE_CHECKING, ClassVar, Iterable, Set, Self, Tuple
 
+from django.conf import settings
 from django.contrib.gis.db.models import PointField
-from django.db import models, transaction
+from django.db import connections, models, transaction
 from django.contrib.auth.models import (
     AbstractBaseUser,
     PermissionsMixin,
@@ -14,12 +16,15 @@ from django.contrib.auth.models import (
 from django.core.validators import MinValueValidator
 from django.db.models import QuerySet
 from django.template.defaultfilters import date
-from django.utils import formats, timezone
+from django.utils import formats, timezone, translation
 from django.utils.translation import gettext_lazy as _
 
 from model_utils.managers import InheritanceManager
 
-from turtlemail.notification_service import NotificationService
+from turtlemail.cache import invalidate_packets
+from turtlemail.human_id.human_id import decode as decode_human_id
+from turtlemail.human_id.human_id import encode as encode_human_id
+from turtlemail.route_service import RouteService
 
 if TYPE_CHECKING:
     from django.db.models.manager import RelatedManager
@@ -163,6 +168,10 @@ class UserSettings(models.Model):
     # settings
     wants_email_notifications_chat = models.BooleanField(default=True)
     wants_email_notifications_requests = models.BooleanField(default=True)
+    # state
+    notification_digest_sent_at = models.DateTimeField(
+        null=True, blank=True, editable=False
+    )
 
 
 class Invite(models.Model):
@@ -342,29 +351,95 @@ class Stay(models.Model):
 
 class PacketManager(models.Manager):
     def get_by_natural_key(self, human_id):
-        return self.get(human_id=human_id)
-
-    def without_valid_route(self):
-        """Return packets that might need a new route."""
-        no_route = self.filter(
-            ~models.Exists(Route.objects.filter(packet=models.OuterRef("pk")))
+        try:
+            pk = decode_human_id(human_id, settings.HUMAN_ID_KEY)
+        except ValueError:
+            # randomly generated before human IDs were encoded from the pk
+            return self.get(human_id=human_id)
+        return self.get(pk=pk, human_id=human_id)
+
+    def create_with_human_id(self, **kwargs) -> "Packet":
+        """
+        Create a packet with its human_id encoded from the primary key.
+        The key is taken from the sequence first, so the human_id is
+        unique without looking for existing ones.
+        """
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence(%s, 'id'))",
+                [self.model._meta.db_table],
+            )
+            (pk,) = cursor.fetchone()
+        return self.create(
+            pk=pk, human_id=encode_human_id(pk, settings.HUMAN_ID_KEY), **kwargs
         )
-        no_current_route = self.filter(
-            ~models.Exists(
-                Route.objects.filter(packet=models.OuterRef("pk"), status=Route.CURRENT)
+
+    def with_routing_state(self):
+        """
+        Annotate packets with their current route and the number of its
+        steps in each status, all computed in a single grouped query.
+
+        Packet.status() uses these annotations instead of querying the
+        route and its steps again.
+        """
+        return self.alias(
+            current_routes=models.FilteredRelation(
+                "all_routes", condition=models.Q(all_routes__status=Route.CURRENT)
             )
+        ).annotate(
+            current_route_id=models.Max("current_routes__id"),
+            current_route_created_at=models.Max("current_routes__created_at"),
+            **step_status_counts("current_routes__steps"),
         )
-        invalid_route = self.filter(
-            models.Exists(
-                Route.objects.filter(
-                    packet=models.OuterRef("pk"),
-                    status=Route.CURRENT,
-                    steps__status__in=[RouteStep.REJECTED, RouteStep.CANCELLED],
+
+    def without_valid_route(self):
+        """
+        Return packets that might need a new route: packets without a
+        current route and packets whose current route contains rejected or
+        cancelled steps.
+
+        Packets carry the annotations of with_routing_state() as well as
+        the time of their latest failed route search.
+        """
+        last_no_route_found = DeliveryLog.objects.filter(
+            packet=models.OuterRef("pk"), action=DeliveryLog.NO_ROUTE_FOUND
+        ).order_by("-created_at")
+
+        return (
+            self.with_routing_state()
+            .filter(
+                models.Q(current_route_id__isnull=True) | models.Q(outdated_steps__gt=0)
+            )
+            .annotate(
+                last_no_route_found_at=models.Subquery(
+                    last_no_route_found.values("created_at")[:1]
                 )
             )
         )
 
-        return no_route.union(no_current_route).union(invalid_route)
+
+def step_status_counts(path: str = "") -> dict[str, models.Count]:
+    """
+    Aggregates counting route steps by status, as needed to derive a
+    packet's status. `path` is the lookup leading from the aggregated
+    model to its route steps.
+    """
+    prefix = f"{path}__" if path else ""
+
+    def count(*statuses):
+        if not statuses:
+            return models.Count(f"{prefix}id")
+        return models.Count(
+            f"{prefix}id", filter=models.Q(**{f"{prefix}status__in": statuses})
+        )
+
+    return {
+        "total_steps": count(),
+        "outdated_steps": count(RouteStep.REJECTED, RouteStep.CANCELLED),
+        "suggested_steps": count(RouteStep.SUGGESTED),
+        "accepted_steps": count(RouteStep.ACCEPTED),
+        "completed_steps": count(RouteStep.COMPLETED),
+    }
 
 
 class Packet(models.Model):
@@ -467,11 +542,22 @@ class Packet(models.Model):
         return self.all_routes.filter(status=Route.CURRENT).first()
 
     def status(self):
-        route = self.current_route()
         if self.is_cancelled:
             return self.Status.CANCELLED
 
-        if route is None:
+        if hasattr(self, "total_steps"):
+            # Annotated by PacketManager.with_routing_state()
+            route_created_at = self.current_route_created_at
+            step_counts = {
+                key: getattr(self, key) for key in step_status_counts().keys()
+            }
+        elif (route := self.current_route()) is not None:
+            route_created_at = route.created_at
+            step_counts = route.steps.aggregate(**step_status_counts())
+        else:
+            route_created_at = None
+
+        if route_created_at is None:
             packet_too_old = (
                 datetime.datetime.now(datetime.UTC) - self.created_at
             ) > datetime.timedelta(days=30)
@@ -480,23 +566,20 @@ class Packet(models.Model):
 
             return self.Status.CALCULATING_ROUTE
 
-        steps = route.steps.all()
-
-        if any([step.status == RouteStep.REJECTED for step in steps]):
-            status = self.Status.ROUTE_OUTDATED
-        elif any([step.status == RouteStep.CANCELLED for step in steps]):
+        total = step_counts["total_steps"]
+        if step_counts["outdated_steps"] > 0:
             status = self.Status.ROUTE_OUTDATED
-        elif any([step.status == RouteStep.SUGGESTED for step in steps]):
+        elif step_counts["suggested_steps"] > 0:
             status = self.Status.CONFIRMING_ROUTE
-        elif all([step.status == RouteStep.ACCEPTED for step in steps]):
+        elif step_counts["accepted_steps"] == total:
             status = self.Status.READY_TO_SHIP
-        elif all([step.status == RouteStep.COMPLETED for step in steps]):
+        elif step_counts["completed_steps"] == total:
             status = self.Status.DELIVERED
         else:
             status = self.Status.DELIVERING
 
         route_too_old = (
-            datetime.datetime.now(datetime.UTC) - route.created_at
+            datetime.datetime.now(datetime.UTC) - route_created_at
         ) > datetime.timedelta(days=30)
 
         # if this is True, we've tried for a very long time to find
@@ -517,21 +600,23 @@ class Packet(models.Model):
             debug("Found no last route. Packet is still with the sender.")
             return None
 
-        # Walk through steps one by one to find the last one that
-        # was not completed
-        step = last_route.steps.filter(previous_step__isnull=True).first()
-        if step is not None and step.status != step.COMPLETED:
+        # Find the first step that was not completed
+        step = (
+            last_route.steps.exclude(status=RouteStep.COMPLETED)
+            .order_by("position")
+            .first()
+        )
+        if step is None:
+            # All steps have been completed
+            return None
+
+        if step.position == 0:
             # Delivery on this route hasn't started.
             # The packet is still with the sender
             return None
 
-        while step is not None:
-            if step.status != step.COMPLETED:
-                debug("Found first incomplete routing step: %s", step)
-                return step
-            step = step.next_step
-
-        return None
+        debug("Found first incomplete routing step: %s", step)
+        return step
 
     def can_cancel(self):
         return self.status() not in [
@@ -557,6 +642,8 @@ class Packet(models.Model):
                 packet=self,
                 action=DeliveryLog.PACKET_CANCELLED,
             )
+            # The steps were updated without post_save
+            invalidate_packets(self.pk)
 
 
 class Route(models.Model):
@@ -585,6 +672,8 @@ class Route(models.Model):
         verbose_name = _("Route")
         verbose_name_plural = _("Routes")
 
+        indexes = [models.Index(fields=["packet", "status"])]
+
     def __str__(self):
         return f"{self.status} Route"
 
@@ -594,6 +683,14 @@ class Route(models.Model):
     def completed_steps(self):
         return self.steps.filter(status=RouteStep.COMPLETED)
 
+    def progress(self) -> dict[str, int]:
+        """Number of steps, and how many of them got accepted and completed."""
+        return self.steps.aggregate(
+            total=models.Count("id"),
+            accepted=models.Count("id", filter=models.Q(status=RouteStep.ACCEPTED)),
+            completed=models.Count("id", filter=models.Q(status=RouteStep.COMPLETED)),
+        )
+
     def is_user_involved(self, user: User):
         return self.steps.filter(stay__user=user).exists()
 
@@ -663,6 +760,18 @@ class RouteStep(models.Model):
     route = models.ForeignKey(
         Route, verbose_name=_("Route"), on_delete=models.CASCADE, related_name="steps"
     )
+    position = models.PositiveIntegerField(
+        verbose_name=_("Position in route"), default=0
+    )
+    "Index of this step within its route, following previous_step and next_step."
+    remaining_distance = models.FloatField(
+        verbose_name=_("Remaining distance to destination"), null=True
+    )
+    "Distance from this step's location to the last step's location of its route."
+    chat_sequence = models.PositiveIntegerField(
+        verbose_name=_("Number of the latest chat message"), default=0
+    )
+    "Sequence number of the latest message in this step's chat, see ChatMessage."
     notified_at = models.DateTimeField(
         verbose_name=_("Last notification sent"), null=True
     )
@@ -673,14 +782,32 @@ class RouteStep(models.Model):
 
         ordering = ["start", "end"]
 
+        indexes = [models.Index(fields=["route", "status"])]
+
         constraints = [
             models.UniqueConstraint(
                 fields=["route"],
                 condition=models.Q(status="ONGOING"),
                 name="only_one_ongoing_step_per_route",
-            )
+            ),
+            models.UniqueConstraint(
+                fields=["route", "position"],
+                name="unique_position_per_route",
+            ),
         ]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored status, so save() only reacts to actual changes
+        instance._saved_status = instance.__dict__.get("status")
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        if fields is None or "status" in fields:
+            self._saved_status = self.__dict__.get("status")
+
     def get_overlapping_date_range(
         self, other: Self | None
     ) -> Tuple[datetime.date | None, datetime.date | None]:
@@ -743,29 +870,36 @@ class RouteStep(models.Model):
         logic to start routing once all steps got accepted
         and start/delete chats
         """
+        if self._state.adding and self.previous_step is not None:
+            self.position = self.previous_step.position + 1
+        status_changed = self._state.adding or self.status != self._saved_status
+
         save = super().save(*args, **kwargs)
-        if (
-            self.route.steps.all().count()
-            == self.route.steps.filter(status=self.ACCEPTED).count()
-        ):
-            first_step = self.route.steps.get(previous_step__isnull=True)
-            first_step.status = self.ONGOING
-            first_step.save()
-
-            # start chats
-            # tbd: We miss multilingual system chat messages! Currently a chat is always in the language of the user
-            #      confirming the last route step
-            for step in self.route.steps.all():
-                NotificationService.send_system_chat_message(
-                    step, SystemChatMessage.SystemMessages.NEW_HANDOVER_CHAT
-                )
-        # delete chat messages
-        if self.status == self.COMPLETED:
-            ChatMessage.objects.filter(route_step=self).delete()
+        if status_changed:
+            RouteService.step_status_changed(self)
+        self._saved_status = self.status
 
         return save
 
 
+class DeliveryLogManager(models.Manager):
+    def with_description_data(self):
+        """
+        Select everything DeliveryLog.describe() needs, so describing
+        a list of entries doesn't query the database again.
+        """
+        route_length = (
+            RouteStep.objects.filter(route=models.OuterRef("route"))
+            .order_by()
+            .values("route")
+            .annotate(count=models.Count("id"))
+            .values("count")
+        )
+        return self.select_related("route_step").annotate(
+            route_length=models.Subquery(route_length)
+        )
+
+
 class DeliveryLog(models.Model):
     ROUTE_STEP_CHANGE = "ROUTE_STEP_CHANGE"
     SEARCHING_ROUTE = "SEARCHING_ROUTE"
@@ -814,8 +948,21 @@ class DeliveryLog(models.Model):
     description = models.TextField(
         verbose_name=_("Human readable log entry"), null=True, blank=True
     )
+    "Only set for entries written before describe() built them when rendering."
+
+    objects = DeliveryLogManager()
+
+    def describe(self) -> str:
+        """
+        Build the human readable log entry in the active language.
+
+        Use DeliveryLogManager.with_description_data() when describing
+        many entries to avoid extra queries.
+        """
+        if self.description:
+            # Entries written before descriptions were built when rendering
+            return self.description
 
-    def _set_description(self):
         description = self.get_action_display()  # type: ignore
 
         if self.action == self.ROUTE_STEP_CHANGE:
@@ -836,48 +983,38 @@ class DeliveryLog(models.Model):
 
         if (
             self.action == self.PACKET_CHANGED_LOCATION
-            and self.route
-            and self.route_step
+            and self.route_id is not None
+            and self.route_step is not None
         ):
+            route_length = getattr(self, "route_length", None)
+            if route_length is None:
+                route_length = RouteStep.objects.filter(route_id=self.route_id).count()
+
             # last step?
-            if (
-                self.route_step
-                == self.route.steps.filter(next_step__isnull=True).first()
-            ):
+            if self.route_step.next_step_id is None:
                 description = _("The delivery has reached its destination.")
+            elif self.route_step.remaining_distance is None:
+                description = _("The packet reached station %(i)s of %(n)s.") % {
+                    "i": str(self.route_step.position + 1),
+                    "n": str(route_length),
+                }
             else:
                 description = _(
                     "The packet reached station %(i)s of %(n)s. It is still %(distance)s kilometers from its destination."
                 ) % {
-                    "i": str(
-                        self.route.steps.filter(status=RouteStep.COMPLETED).count()
-                        + 1  # this is called step pre save -> missing 1
-                    ),
-                    "n": str(self.route.steps.count()),
-                    "distance": str(
-                        round(
-                            self.route_step.stay.location.point.distance(
-                                self.route.steps.get(
-                                    next_step__isnull=True
-                                ).stay.location.point
-                            ),
-                            2,
-                        )
-                    ),
+                    "i": str(self.route_step.position + 1),
+                    "n": str(route_length),
+                    "distance": str(round(self.route_step.remaining_distance, 2)),
                 }
-        self.description = description
 
         return description
 
-    def save(self, *args, **kwargs):
-        self._set_description()
-        return super().save(*args, **kwargs)
-
     class Meta:
         verbose_name = _("Delivery Log Entry")
         verbose_name_plural = _("Delivery Log Entries")
 
         ordering = ["-created_at"]
+        indexes = [models.Index(fields=["packet", "-created_at", "-id"])]
 
 
 class ChatMessage(models.Model):
@@ -900,12 +1037,45 @@ class ChatMessage(models.Model):
         choices=StatusChoices.choices,
         default=StatusChoices.NEW,
     )
+    sequence = models.PositiveIntegerField(
+        verbose_name=_("Number within the chat"), default=0
+    )
+    "Counts up from 1 for the messages of each route step, assigned on insert."
 
     class Meta:
         verbose_name = _("Chat message")
         verbose_name_plural = _("Chat messages")
 
-        ordering = ["route_step", "created_at"]
+        ordering = ["route_step", "sequence"]
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["route_step", "sequence"],
+                name="unique_sequence_per_route_step",
+            ),
+        ]
+
+    @staticmethod
+    def next_sequences(route_step_ids: Iterable[int]) -> dict[int, int]:
+        """
+        Count up the chat sequence of each given route step by one and
+        return the new numbers by step id. Must run inside a transaction,
+        which keeps the steps locked against concurrent inserts until
+        the messages are saved.
+        """
+        steps = RouteStep.objects.filter(id__in=route_step_ids)
+        steps.update(chat_sequence=models.F("chat_sequence") + 1)
+        return dict(steps.values_list("id", "chat_sequence"))
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding or self.sequence:
+            return super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            self.sequence = ChatMessage.next_sequences([self.route_step_id])[
+                self.route_step_id
+            ]
+            return super().save(*args, **kwargs)
 
 
 class SystemChatMessage(ChatMessage):
@@ -933,7 +1103,20 @@ class SystemChatMessage(ChatMessage):
     # override of content field with dynamic localized data
     @property
     def content(self):
-        data = json.loads(self.content_data)
+        return self._format_content(
+            self.message_type, self.content_data, translation.get_language()
+        )
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1024)
+    def _format_content(message_type: int, content_data: str, language: str) -> str:
+        """
+        Render a system message in the given (active) language.
+
+        Its data never changes after creation, so rendering the same message
+        again in the same language can skip parsing and localizing the data.
+        """
+        data = json.loads(content_data)
         format_data = {}
         for key, value in data.items():
             if value["type"] == "str":
@@ -941,17 +1124,18 @@ class SystemChatMessage(ChatMessage):
             elif value["type"] == "ts":
                 format_data[key] = formats.date_format(
                     datetime.datetime.strptime(
-                        value["data"], self.TS_SERIALIZATION_FORMAT
+                        value["data"], SystemChatMessage.TS_SERIALIZATION_FORMAT
                     )
                 )
             elif value["type"] == "date":
                 format_data[key] = formats.date_format(
                     datetime.datetime.strptime(
-                        value["data"], self.DATE_SERIALIZATION_FORMAT
+                        value["data"], SystemChatMessage.DATE_SERIALIZATION_FORMAT
                     ).date()
                 )
 
-        return self.get_message_type_display().format(**format_data)
+        label = SystemChatMessage.SystemMessages(message_type).label
+        return str(label).format(**format_data)
 
     @content.setter
     def content(self, data: dict):
@@ -995,3 +1179,231 @@ class UserChatMessage(ChatMessage):
 
     def is_system_msg(self):
         return False
+
+    def recipient_id(self) -> int | None:
+        """The other participant of the chat, if there is one."""
+        step = self.route_step
+        if step.stay.user_id != self.author_id:
+            return step.stay.user_id
+        if step.next_step_id is None:
+            # Final step, nobody takes the packet from here
+            return None
+        return step.next_step.stay.user_id
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        with transaction.atomic():
+            save = super().save(*args, **kwargs)
+            recipient_id = (
+                self.recipient_id()
+                if adding and self.status != ChatMessage.StatusChoices.RECEIVED
+                else None
+            )
+            if recipient_id is not None:
+                UnreadChatCounter.increment(recipient_id, self.route_step_id)
+        return save
+
+
+class UnreadChatCounter(models.Model):
+    """
+    Number of unread messages a user has in the chat of a route step.
+
+    Kept up to date when messages are sent and read, so unread state
+    doesn't need to be counted from the messages. Recompute them with
+    the repair_unread_counters command if they ever drift apart.
+    """
+
+    user = models.ForeignKey(
+        User,
+        verbose_name=_("User"),
+        on_delete=models.CASCADE,
+        related_name="unread_chat_counters",
+    )
+    route_step = models.ForeignKey(
+        RouteStep,
+        verbose_name=_("RouteStep context"),
+        on_delete=models.CASCADE,
+        related_name="unread_chat_counters",
+    )
+    count = models.PositiveIntegerField(verbose_name=_("Unread messages"), default=0)
+
+    class Meta:
+        verbose_name = _("Unread chat messages counter")
+        verbose_name_plural = _("Unread chat messages counters")
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "route_step"],
+                name="unique_unread_counter_per_user_and_route_step",
+            ),
+        ]
+
+    @classmethod
+    def increment(cls, user_id: int, route_step_id: int):
+        counter = cls.objects.filter(user_id=user_id, route_step_id=route_step_id)
+        if not counter.update(count=models.F("count") + 1):
+            # First message for this user in this chat
+            cls.objects.get_or_create(user_id=user_id, route_step_id=route_step_id)
+            counter.update(count=models.F("count") + 1)
+
+    @classmethod
+    def recompute(cls) -> int:
+        """
+        Replace all counters with the unread messages counted from the
+        chat messages themselves. Returns the number of counters.
+        """
+        participants = {
+            step_id: (giver_id, taker_id)
+            for step_id, giver_id, taker_id in RouteStep.objects.filter(
+                next_step__isnull=False
+            ).values_list("id", "stay__user_id", "next_step__stay__user_id")
+        }
+        unread = (
+            UserChatMessage.objects.filter(
+                status__in=(
+                    ChatMessage.StatusChoices.NEW,
+                    ChatMessage.StatusChoices.NOTIFIED,
+                )
+            )
+            .order_by()
+            .values_list("route_step_id", "author_id")
+            .annotate(count=models.Count("pk"))
+        )
+        counts: dict[tuple[int, int], int] = {}
+        for route_step_id, author_id, count in unread:
+            if route_step_id not in participants:
+                continue
+            for user_id in participants[route_step_id]:
+                if user_id != author_id:
+                    key = (user_id, route_step_id)
+                    counts[key] = counts.get(key, 0) + count
+
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(
+                (
+                    cls(user_id=user_id, route_step_id=route_step_id, count=count)
+                    for (user_id, route_step_id), count in counts.items()
+                ),
+                batch_size=1000,
+            )
+        return len(counts)
+
+
+class OutgoingEmail(models.Model):
+    """
+    An email waiting to be sent, see turtlemail.outbox.
+
+    Emails are stored in the transaction of whatever caused them and
+    delivered later in batches, so no request waits for the mail server.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "PENDING", _("Pending")
+        SENT = "SENT", _("Sent")
+        FAILED = "FAILED", _("Failed")
+
+    created_at = models.DateTimeField(verbose_name=_("Datetime"), auto_now_add=True)
+    subject = models.TextField(verbose_name=_("Subject"))
+    body = models.TextField(verbose_name=_("Message"))
+    from_email = models.TextField(verbose_name=_("Sender"), null=True, blank=True)
+    "The DEFAULT_FROM_EMAIL setting is used if this is empty."
+    recipient = models.TextField(verbose_name=_("Recipient"))
+    status = models.TextField(
+        verbose_name=_("Status"), choices=Status.choices, default=Status.PENDING
+    )
+    attempts = models.PositiveIntegerField(verbose_name=_("Attempts"), default=0)
+    next_attempt_at = models.DateTimeField(
+        verbose_name=_("Next attempt"), default=timezone.now
+    )
+    sent_at = models.DateTimeField(verbose_name=_("Sent at"), null=True, blank=True)
+    last_error = models.TextField(verbose_name=_("Last error"), blank=True, default="")
+
+    class Meta:
+        verbose_name = _("Outgoing email")
+        verbose_name_plural = _("Outgoing emails")
+
+        indexes = [models.Index(fields=["status", "next_attempt_at"])]
+
+    def __str__(self):
+        return f"{self.subject} to {self.recipient}"
+
+
+class NotificationEvent(models.Model):
+    """
+    Something a user should be emailed about. Events are collected and sent
+    as one digest per user, see NotificationService.send_notification_digests.
+    """
+
+    class Kind(models.TextChoices):
+        CHAT_MESSAGE = "CHAT_MESSAGE", _("New chat messages")
+        ROUTING_REQUEST = "ROUTING_REQUEST", _("Open routing request")
+
+    created_at = models.DateTimeField(verbose_name=_("Datetime"), auto_now_add=True)
+    user = models.ForeignKey(
+        User,
+        verbose_name=_("User"),
+        on_delete=models.CASCADE,
+        related_name="notification_events",
+    )
+    kind = models.TextField(verbose_name=_("Kind"), choices=Kind.choices)
+    route_step = models.ForeignKey(
+        RouteStep,
+        verbose_name=_("RouteStep context"),
+        on_delete=models.CASCADE,
+        related_name="notification_events",
+    )
+
+    class Meta:
+        verbose_name = _("Notification event")
+        verbose_name_plural = _("Notification events")
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "route_step", "kind"],
+                name="unique_notification_event",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.kind} for {self.user}"
+
+
+class DailyStats(models.Model):
+    """
+    Statistics of a day, kept up to date by a periodic task so turtlestats
+    can return time series without going through the whole history.
+    """
+
+    date = models.DateField(verbose_name=_("Date"), unique=True)
+    # activity during the day
+    new_accounts = models.PositiveIntegerField(
+        verbose_name=_("New accounts"), default=0
+    )
+    new_packets = models.PositiveIntegerField(verbose_name=_("New packets"), default=0)
+    # state at the last update during the day, unknown for days before
+    # statistics were collected
+    accounts = models.PositiveIntegerField(verbose_name=_("Accounts"), null=True)
+    packets_waiting = models.PositiveIntegerField(
+        verbose_name=_("Packets waiting"), null=True
+    )
+    packets_in_transit = models.PositiveIntegerField(
+        verbose_name=_("Packets in transit"), null=True
+    )
+    packets_delivered = models.PositiveIntegerField(
+        verbose_name=_("Packets delivered"), null=True
+    )
+    stays_min = models.PositiveIntegerField(
+        verbose_name=_("Minimum stays per user"), null=True
+    )
+    stays_max = models.PositiveIntegerField(
+        verbose_name=_("Maximum stays per user"), null=True
+    )
+    stays_median = models.FloatField(verbose_name=_("Median stays per user"), null=True)
+
+    class Meta:
+        verbose_name = _("Daily statistics")
+        verbose_name_plural = _("Daily statistics")
+
+    def __str__(self):
+        return str(self.date)
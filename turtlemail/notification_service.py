@@ -1,113 +1,338 @@
 from __future__ import annotations
-from datetime import datetime
-from typing import TYPE_CHECKING
+from datetime import timedelta
+from itertools import groupby
+from logging import debug
+from typing import TYPE_CHECKING, Iterable
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 from django.conf import settings
-from django.core import serializers
-from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import (
+    BigIntegerField,
+    Case,
+    Exists,
+    F,
+    OuterRef,
+    Q,
+    Subquery,
+    When,
+)
+from django.db.models.functions import Greatest
 from django.template.loader import render_to_string
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 if TYPE_CHECKING:
-    from turtlemail.models import RouteStep, SystemChatMessage, User
+    from turtlemail.models import RouteStep, SystemChatMessage, User, UserChatMessage
 
 channel_layer = get_channel_layer()
 
 
 class NotificationService:
     @classmethod
-    def send_system_chat_message(
-        cls, step: RouteStep, message_type: SystemChatMessage.SystemMessages
+    def send_system_chat_messages(
+        cls, steps: Iterable[RouteStep], message_type: SystemChatMessage.SystemMessages
     ):
+        """Post the same kind of system message into the chats of all given steps."""
         from turtlemail.models import ChatMessage, SystemChatMessage
 
-        system_message = SystemChatMessage()
-        system_message.route_step = step
-        system_message.message_type = message_type
-        system_message.content = {
-            "date": step.end,
-            "location": str(step.stay.location),
-        }
-        system_message.status = ChatMessage.StatusChoices.RECEIVED
-        system_message.save()
+        system_messages = []
+        for step in steps:
+            system_message = SystemChatMessage()
+            system_message.route_step = step
+            system_message.message_type = message_type
+            system_message.content = {
+                "date": step.end,
+                "location": str(step.stay.location),
+            }
+            system_message.status = ChatMessage.StatusChoices.RECEIVED
+            system_messages.append(system_message)
+        if not system_messages:
+            return system_messages
+
+        with transaction.atomic():
+            # Only a few steps change at once, so the messages are saved one
+            # by one, their sequences are still counted up together.
+            sequences = ChatMessage.next_sequences(
+                message.route_step.pk for message in system_messages
+            )
+            for message in system_messages:
+                message.sequence = sequences[message.route_step.pk]
+                message.save()
+        return system_messages
 
     @classmethod
     def notify_messages_read(cls, user: User, step: RouteStep):
-        from turtlemail.models import ChatMessage, UserChatMessage
+        """
+        Mark the messages the other user sent in this chat as received and
+        update the receipts in their open chats with a single event.
+        """
+        from turtlemail.cache import invalidate
+        from turtlemail.models import ChatMessage, UnreadChatCounter
 
-        now_read_messages = UserChatMessage.objects.filter(
+        now_read_messages = ChatMessage.objects.filter(
             route_step=step,
             status__in=(
                 ChatMessage.StatusChoices.NEW,
                 ChatMessage.StatusChoices.NOTIFIED,
             ),
-        ).exclude(author=user)
-        messages_count = ChatMessage.objects.filter(route_step=step).count()
-        now_read_messages_count = now_read_messages.count()
-        for message in now_read_messages:
-            now_read_messages_count -= 1
-            message.status = ChatMessage.StatusChoices.RECEIVED
-            async_to_sync(channel_layer.group_send)(
-                f"chat_{str(step.pk)}",
-                {
-                    "type": "chat_message",
-                    "message": serializers.serialize(
-                        "json", [message, message.chatmessage_ptr]
-                    ),
-                    "index": messages_count - now_read_messages_count,
-                    "update": True,
-                },
+            userchatmessage__isnull=False,
+        ).exclude(userchatmessage__author=user)
+        sequences = list(now_read_messages.values_list("sequence", flat=True))
+        if not sequences:
+            return
+
+        with transaction.atomic():
+            read = now_read_messages.filter(sequence__in=sequences).update(
+                status=ChatMessage.StatusChoices.RECEIVED
             )
-            message.save()
+            # Messages sent in the meantime are still unread, so only the
+            # ones marked as read are subtracted instead of resetting it.
+            # The counter may have drifted below that, it can't go negative.
+            UnreadChatCounter.objects.filter(user=user, route_step=step).update(
+                count=Greatest(F("count") - read, 0)
+            )
+            invalidate(("chats", user.pk))
+        async_to_sync(channel_layer.group_send)(
+            f"chat_{str(step.pk)}",
+            {
+                "type": "messages_read",
+                "reader_id": user.pk,
+                "sequences": sequences,
+            },
+        )
 
     @classmethod
-    def send_email_notification_chat(cls, user: User):
-        from turtlemail.views import ChatsView
+    def chat_message_event(cls, message: UserChatMessage) -> dict:
+        """
+        Build the channel layer event announcing a new chat message.
 
-        chat_list = ChatsView.get_chat_list_context(user)
-        communication_url = settings.BASE_URL + reverse("chats")
-        mail_text = render_to_string(
-            "turtlemail/emails/notification_chat.jinja",
-            {
-                "user": user,
-                "chat_list": chat_list,
-                "communication_url": communication_url,
-            },
+        The message looks different to its author than to the other user.
+        Both variants are rendered once here, so the receiving consumers
+        only have to pick theirs.
+        """
+        html = {
+            "own": render_to_string(
+                "turtlemail/_chat_message.jinja",
+                {"msg": message, "new_msg": True, "user": message.author},
+            ),
+            "other": render_to_string(
+                "turtlemail/_chat_message.jinja",
+                {"msg": message, "new_msg": True, "user": None},
+            ),
+        }
+        return {
+            "type": "chat_message",
+            "message_id": message.pk,
+            "author_id": message.author_id,
+            "status": message.status,
+            "sequence": message.sequence,
+            "html": html,
+        }
+
+    @classmethod
+    def queue_chat_notifications(cls):
+        """
+        Queue a notification for everyone who got new chat messages since
+        the last run and mark those messages as notified.
+        """
+        from turtlemail.models import (
+            ChatMessage,
+            NotificationEvent,
+            User,
+            UserChatMessage,
         )
-        send_mail(
-            subject=_("You've new chat messages in your turtlemail account."),
-            message=mail_text,
-            from_email=None,
-            recipient_list=[user.email],
+
+        # Messages arriving meanwhile are left for the next run
+        message_ids = list(
+            UserChatMessage.objects.filter(
+                status=ChatMessage.StatusChoices.NEW
+            ).values_list("id", flat=True)
         )
+        if not message_ids:
+            return
+
+        # The recipient is whoever of the two participants didn't write it
+        recipient = Case(
+            When(
+                author=F("route_step__stay__user"),
+                then=F("route_step__next_step__stay__user"),
+            ),
+            default=F("route_step__stay__user"),
+            output_field=BigIntegerField(),
+        )
+        chats = (
+            UserChatMessage.objects.filter(id__in=message_ids)
+            .annotate(recipient=recipient)
+            .filter(
+                recipient__in=User.objects.filter(
+                    settings__wants_email_notifications_chat=True
+                ).values("id")
+            )
+            .values_list("recipient", "route_step")
+            # the default ordering would add sequence to the DISTINCT
+            .order_by()
+            .distinct()
+        )
+        with transaction.atomic():
+            NotificationEvent.objects.bulk_create(
+                (
+                    NotificationEvent(
+                        user_id=user_id,
+                        route_step_id=route_step_id,
+                        kind=NotificationEvent.Kind.CHAT_MESSAGE,
+                    )
+                    for user_id, route_step_id in chats
+                ),
+                ignore_conflicts=True,
+            )
+            ChatMessage.objects.filter(
+                id__in=message_ids, status=ChatMessage.StatusChoices.NEW
+            ).update(status=ChatMessage.StatusChoices.NOTIFIED)
 
     @classmethod
-    def send_email_notification_requests(cls, user: User):
-        from turtlemail.models import RouteStep, Route
+    def queue_requests_notifications(cls):
+        """
+        Queue a notification for all routing requests waiting for an answer
+        of users who haven't been reminded of all of them recently.
+        """
+        from turtlemail.models import NotificationEvent, Route, RouteStep
 
-        requested_steps = RouteStep.objects.filter(
+        now = timezone.now()
+        open_requests = RouteStep.objects.filter(
             status=RouteStep.SUGGESTED,
-            stay__user=user,
             route__status=Route.CURRENT,
+            stay__user__settings__wants_email_notifications_requests=True,
         )
-        if len(requested_steps) == 0:
+        due_users = open_requests.filter(
+            Q(notified_at__isnull=True)
+            | Q(
+                notified_at__lte=now
+                - timedelta(hours=settings.ROUTING_REQUEST_NOTIFICATION_INTERVAL)
+            )
+        ).values("stay__user")
+        requested_steps = list(
+            open_requests.filter(stay__user__in=due_users).values_list(
+                "id", "stay__user"
+            )
+        )
+        if not requested_steps:
             return
 
-        deliveries_url = settings.BASE_URL + reverse("deliveries")
-        mail_text = render_to_string(
-            "turtlemail/emails/notification_requests.jinja",
-            {
-                "user": user,
-                "requested_steps": requested_steps,
-                "deliveries_url": deliveries_url,
-            },
+        with transaction.atomic():
+            NotificationEvent.objects.bulk_create(
+                (
+                    NotificationEvent(
+                        user_id=user_id,
+                        route_step_id=step_id,
+                        kind=NotificationEvent.Kind.ROUTING_REQUEST,
+                    )
+                    for step_id, user_id in requested_steps
+                ),
+                ignore_conflicts=True,
+            )
+            RouteStep.objects.filter(
+                id__in=[step_id for step_id, _user_id in requested_steps]
+            ).update(notified_at=now)
+
+    @classmethod
+    def send_notification_digests(cls):
+        """
+        Email the queued notifications, merged into at most one email per
+        user per NOTIFICATION_DIGEST_WINDOW. The emails for a whole batch
+        of users are built from a single query.
+        """
+        from turtlemail.models import (
+            NotificationEvent,
+            RouteStep,
+            UnreadChatCounter,
+            User,
+            UserSettings,
         )
-        send_mail(
-            subject=_("You've open routing requests in your turtlemail account."),
-            message=mail_text,
-            from_email=None,
-            recipient_list=[user.email],
+        from turtlemail.outbox import queue_mass_mail
+        from turtlemail.views import ChatsView
+
+        now = timezone.now()
+        due_users = User.objects.filter(
+            Q(settings__notification_digest_sent_at__isnull=True)
+            | Q(
+                settings__notification_digest_sent_at__lte=now
+                - timedelta(minutes=settings.NOTIFICATION_DIGEST_WINDOW)
+            ),
+            Exists(NotificationEvent.objects.filter(user=OuterRef("pk"))),
+        ).values("id")[: settings.NOTIFICATION_DIGEST_BATCH_SIZE]
+        events = list(
+            NotificationEvent.objects.filter(user__in=due_users)
+            .select_related(
+                "user",
+                "route_step__packet",
+                "route_step__stay__user",
+                "route_step__next_step__stay__user",
+            )
+            .annotate(
+                unread_count=Subquery(
+                    UnreadChatCounter.objects.filter(
+                        user=OuterRef("user"), route_step=OuterRef("route_step")
+                    ).values("count")
+                )
+            )
+            .order_by("user", "kind", "route_step")
         )
-        requested_steps.update(notified_at=datetime.now())
+        if not events:
+            return
+
+        communication_url = settings.BASE_URL + reverse("chats")
+        deliveries_url = settings.BASE_URL + reverse("deliveries")
+        emails = []
+        notified_user_ids = []
+        for _user_id, user_events in groupby(events, key=lambda event: event.user_id):
+            user_events = list(user_events)
+            user = user_events[0].user
+            # Things may have been dealt with since the event was queued,
+            # like chats the user has read in the meantime
+            chat_list = [
+                ChatsView.get_chat_context(event.route_step, user, updated=True)
+                for event in user_events
+                if event.kind == NotificationEvent.Kind.CHAT_MESSAGE
+                and event.route_step.status in (RouteStep.ACCEPTED, RouteStep.ONGOING)
+                and event.unread_count
+            ]
+            requested_steps = [
+                event.route_step
+                for event in user_events
+                if event.kind == NotificationEvent.Kind.ROUTING_REQUEST
+                and event.route_step.status == RouteStep.SUGGESTED
+            ]
+            if not chat_list and not requested_steps:
+                continue
+
+            if chat_list and requested_steps:
+                subject = _("You've news in your turtlemail account.")
+            elif chat_list:
+                subject = _("You've new chat messages in your turtlemail account.")
+            else:
+                subject = _("You've open routing requests in your turtlemail account.")
+            debug(f"Send notification digest email to {user}.")
+            mail_text = render_to_string(
+                "turtlemail/emails/notification_digest.jinja",
+                {
+                    "user": user,
+                    "chat_list": chat_list,
+                    "communication_url": communication_url,
+                    "requested_steps": requested_steps,
+                    "deliveries_url": deliveries_url,
+                },
+            )
+            emails.append((subject, mail_text, None, [user.email]))
+            notified_user_ids.append(user.pk)
+
+        with transaction.atomic():
+            queue_mass_mail(emails)
+            # Events queued meanwhile are left for the next digest
+            NotificationEvent.objects.filter(
+                id__in=[event.pk for event in events]
+            ).delete()
+            UserSettings.objects.filter(user_id__in=notified_user_ids).update(
+                notification_digest_sent_at=now
+            )
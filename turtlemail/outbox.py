@@ -0,0 +1,120 @@
+import logging
+import time
+from typing import Iterable
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+from turtlemail import metrics
+from turtlemail.models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+
+def queue_mail(
+    subject: str,
+    message: str,
+    from_email: str | None,
+    recipient_list: Iterable[str],
+) -> list[OutgoingEmail]:
+    """
+    Store an email in the outbox, with the same arguments as send_mail().
+
+    It's written in the current transaction, so the email is only sent if
+    whatever caused it is committed as well.
+    """
+    return queue_mass_mail([(subject, message, from_email, recipient_list)])
+
+
+def queue_mass_mail(
+    datatuple: Iterable[tuple[str, str, str | None, Iterable[str]]],
+) -> list[OutgoingEmail]:
+    """
+    Store many emails in the outbox at once, with the same arguments as
+    send_mass_mail(): (subject, message, from_email, recipient_list) tuples.
+    """
+    return OutgoingEmail.objects.bulk_create(
+        OutgoingEmail(
+            subject=str(subject),
+            body=message,
+            from_email=from_email,
+            recipient=recipient,
+        )
+        for subject, message, from_email, recipient_list in datatuple
+        for recipient in recipient_list
+    )
+
+
+def send_queued_mails() -> int:
+    """
+    Send due emails from the outbox over a single connection to the mail
+    server. Failed emails are retried with exponential backoff until
+    EMAIL_OUTBOX_MAX_ATTEMPTS is reached. Returns the number of sent emails.
+
+    Only one of these should run at a time.
+    """
+    emails = list(
+        OutgoingEmail.objects.filter(
+            status=OutgoingEmail.Status.PENDING, next_attempt_at__lte=timezone.now()
+        ).order_by("next_attempt_at", "id")[: settings.EMAIL_OUTBOX_BATCH_SIZE]
+    )
+    if not emails:
+        return 0
+
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        logger.error("Could not connect to the mail server: %s", e)
+        # Says nothing about the emails themselves, so it doesn't count as
+        # an attempt. They're only tried again later.
+        OutgoingEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+            next_attempt_at=timezone.now() + settings.EMAIL_OUTBOX_RETRY_DELAY,
+            last_error=str(e),
+        )
+        return 0
+
+    sent = 0
+    try:
+        for email in emails:
+            if sent and settings.EMAIL_OUTBOX_RATE_LIMIT:
+                time.sleep(1 / settings.EMAIL_OUTBOX_RATE_LIMIT)
+            message = EmailMessage(
+                subject=email.subject,
+                body=email.body,
+                from_email=email.from_email,
+                to=[email.recipient],
+                connection=connection,
+            )
+            try:
+                connection.send_messages([message])
+            except Exception as e:
+                logger.error("Could not send %s: %s", email, e)
+                _failed(email, e)
+                continue
+
+            email.status = OutgoingEmail.Status.SENT
+            email.sent_at = timezone.now()
+            email.attempts += 1
+            email.save(update_fields=["status", "sent_at", "attempts"])
+            metrics.EMAILS.inc(result="sent")
+            sent += 1
+    finally:
+        connection.close()
+
+    return sent
+
+
+def _failed(email: OutgoingEmail, error: Exception):
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        email.status = OutgoingEmail.Status.FAILED
+        metrics.EMAILS.inc(result="failed")
+    else:
+        metrics.EMAILS.inc(result="retry")
+        email.next_attempt_at = timezone.now() + settings.EMAIL_OUTBOX_RETRY_DELAY * (
+            2 ** (email.attempts - 1)
+        )
+    email.save(update_fields=["attempts", "last_error", "status", "next_attempt_at"])
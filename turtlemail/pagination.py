@@ -0,0 +1,87 @@
+import datetime
+from dataclasses import dataclass
+from typing import Generic, List, TypeVar
+
+from django.core.exceptions import BadRequest
+from django.db import models
+
+T = TypeVar("T", bound=models.Model)
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.UTC)
+
+
+@dataclass
+class KeysetPage(Generic[T]):
+    items: List[T]
+    # Pass this as the cursor to get the next page.
+    # None if this is the last page.
+    next_cursor: str | None
+
+    @property
+    def has_more(self) -> bool:
+        return self.next_cursor is not None
+
+
+def encode_cursor(created_at: datetime.datetime, pk: int) -> str:
+    micros = (created_at - _EPOCH) // datetime.timedelta(microseconds=1)
+    return f"{micros}-{pk}"
+
+
+def decode_cursor(cursor: str) -> tuple[datetime.datetime, int]:
+    try:
+        micros, pk = cursor.split("-")
+        return _EPOCH + datetime.timedelta(microseconds=int(micros)), int(pk)
+    except ValueError:
+        raise BadRequest(f"Invalid cursor: {cursor}")
+
+
+def paginate_newest_first(
+    queryset: models.QuerySet[T], cursor: str | None, page_length: int
+) -> KeysetPage[T]:
+    """
+    Return one page of objects ordered by (created_at, id), newest first.
+
+    Instead of an offset, pages are selected by the position of the last
+    object of the previous page, so fetching later pages stays as cheap
+    as fetching the first one.
+    """
+    queryset = queryset.order_by("-created_at", "-id")
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            models.Q(created_at__lt=created_at)
+            | models.Q(created_at=created_at, id__lt=pk)
+        )
+
+    # Fetch one more object than needed to know if there's a next page
+    items = list(queryset[: page_length + 1])
+    if len(items) <= page_length:
+        return KeysetPage(items=items, next_cursor=None)
+
+    items = items[:page_length]
+    last = items[-1]
+    return KeysetPage(items=items, next_cursor=encode_cursor(last.created_at, last.pk))
+
+
+def paginate_descending(
+    queryset: models.QuerySet[T], field: str, cursor: str | None, page_length: int
+) -> KeysetPage[T]:
+    """
+    Return one page of objects ordered by a unique integer field,
+    highest first. The cursor is the field's value of the last object
+    of the previous page.
+    """
+    queryset = queryset.order_by(f"-{field}")
+    if cursor:
+        try:
+            before = int(cursor)
+        except ValueError:
+            raise BadRequest(f"Invalid cursor: {cursor}")
+        queryset = queryset.filter(**{f"{field}__lt": before})
+
+    items = list(queryset[: page_length + 1])
+    if len(items) <= page_length:
+        return KeysetPage(items=items, next_cursor=None)
+
+    items = items[:page_length]
+    return KeysetPage(items=items, next_cursor=str(getattr(items[-1], field)))
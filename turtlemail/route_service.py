@@ -0,0 +1,56 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+
+from django.db import transaction
+
+from turtlemail.notification_service import NotificationService
+
+if TYPE_CHECKING:
+    from turtlemail.models import Route, RouteStep
+
+
+class RouteService:
+    """State transitions of routes that follow from status changes of their steps."""
+
+    @classmethod
+    def step_status_changed(cls, step: RouteStep):
+        from turtlemail.cache import invalidate_chat
+        from turtlemail.models import (
+            ChatMessage,
+            RouteStep,
+            UnreadChatCounter,
+            step_status_counts,
+        )
+
+        if step.status == RouteStep.ACCEPTED:
+            counts = step.route.steps.aggregate(**step_status_counts())
+            if counts["accepted_steps"] == counts["total_steps"]:
+                cls.start_delivery(step.route)
+
+        # delete chat messages
+        if step.status == RouteStep.COMPLETED:
+            ChatMessage.objects.filter(route_step=step).delete()
+            UnreadChatCounter.objects.filter(route_step=step).delete()
+            invalidate_chat(step.pk)
+
+    @classmethod
+    def start_delivery(cls, route: Route):
+        """
+        Once all steps of a route got accepted, hand the packet to the
+        first step and start the handover chats.
+        """
+        from turtlemail.cache import invalidate_packets
+        from turtlemail.models import RouteStep, SystemChatMessage
+
+        with transaction.atomic():
+            route.steps.filter(position=0).update(status=RouteStep.ONGOING)
+            # update() doesn't send post_save
+            invalidate_packets(route.packet_id)
+
+            # start chats
+            # tbd: We miss multilingual system chat messages! Currently a chat is always in the language of the user
+            #      confirming the last route step
+            NotificationService.send_system_chat_messages(
+                route.steps.select_related("stay__location"),
+                SystemChatMessage.SystemMessages.NEW_HANDOVER_CHAT,
+            )
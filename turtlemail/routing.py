@@ -3,10 +3,12 @@ from datetime import date, timedelta
 import datetime
 import logging
 import math
-from typing import List, Set, Tuple
+import time
+from typing import Iterable, List, Set, Tuple
 from django.conf import settings
 from django.contrib.gis import measure
 from django.db import models, transaction
+from turtlemail import metrics
 from turtlemail.models import DeliveryLog, Packet, Route, RouteStep, Stay
 
 RADIUS = measure.Distance(km=10)
@@ -142,11 +144,19 @@ def get_starting_stay(packet: Packet, calculation_date: date) -> Stay | None:
     )
 
 
+def record_route_search(started: float, result: str, expanded_nodes: int = 0):
+    metrics.ROUTE_SEARCH_DURATION.observe(time.monotonic() - started)
+    metrics.ROUTE_SEARCH_EXPANDED_NODES.observe(expanded_nodes)
+    metrics.ROUTE_SEARCHES.inc(result=result)
+
+
 # This is the main algorithm.
 def find_route(packet: Packet, calculation_date: date) -> List[RoutingNode] | None:
+    started = time.monotonic()
     # Set up initial data
     starting_stay = get_starting_stay(packet, calculation_date)
     if starting_stay is None:
+        record_route_search(started, "no_starting_stay")
         return None
 
     # This is the data structure our algorithm uses to keep track of
@@ -254,6 +264,7 @@ def find_route(packet: Packet, calculation_date: date) -> List[RoutingNode] | No
         # We've visited all reachable nodes but were unable to
         # find a route to the recipient
         logger.debug("Found no route to recipient")
+        record_route_search(started, "not_found", len(visited_stay_ids))
         return None
 
     # We've found the target. Reconstruct the shortest route
@@ -270,6 +281,7 @@ def find_route(packet: Packet, calculation_date: date) -> List[RoutingNode] | No
     route = trim_sender_stays_at_start(route)
 
     logger.debug("Found a route with %s steps", len(reverse_route))
+    record_route_search(started, "found", len(visited_stay_ids))
 
     return route
 
@@ -426,9 +438,12 @@ def create_new_route(packet: Packet, starting_date: date) -> Route | None:
             step_dates = calculate_routestep_dates(
                 [node.stay for node in nodes], calculation_date=starting_date
             )
+            destination = nodes[-1].stay.location.point
             steps = []
             previous_step = None
-            for node, (start, end) in zip(nodes, step_dates, strict=True):
+            for position, (node, (start, end)) in enumerate(
+                zip(nodes, step_dates, strict=True)
+            ):
                 step = RouteStep.objects.create(
                     stay=node.stay,
                     start=start,
@@ -437,6 +452,8 @@ def create_new_route(packet: Packet, starting_date: date) -> Route | None:
                     next_step=None,
                     packet=packet,
                     route=route,
+                    position=position,
+                    remaining_distance=node.stay.location.point.distance(destination),
                     status=RouteStep.SUGGESTED,
                 )
 
@@ -460,6 +477,7 @@ def create_new_route(packet: Packet, starting_date: date) -> Route | None:
             return route
     except Exception as e:
         logger.error(e)
+        metrics.ROUTE_CREATION_ERRORS.inc()
         DeliveryLog.objects.create(packet=packet, action=DeliveryLog.NO_ROUTE_FOUND)
 
 
@@ -478,24 +496,28 @@ def check_and_recalculate_route(route: Route, starting_date: date) -> Route | No
     return create_new_route(route.packet, starting_date)
 
 
-def recalculate_missing_routes(packets: List[Packet], starting_date: datetime.datetime):
+def recalculate_missing_routes(
+    packets: Iterable[Packet], starting_date: datetime.datetime
+):
+    """
+    Look for new routes for the given packets.
+
+    Packets are expected to come from Packet.objects.without_valid_route(),
+    so their routing state is already annotated and we don't need to query
+    for it again.
+    """
     for packet in packets:
         if packet.status() in [Packet.Status.NO_ROUTE_FOUND, Packet.Status.CANCELLED]:
             # We gave up to find a route for this packet.
             continue
 
         last_calculation = packet.created_at
-        if (
-            first_log := packet.delivery_logs.filter(
-                action=DeliveryLog.NO_ROUTE_FOUND
-            ).first()
-        ) is not None:
-            last_calculation = first_log.created_at
+        if packet.last_no_route_found_at is not None:
+            last_calculation = packet.last_no_route_found_at
 
         first_calculation = packet.created_at
-        current_route = packet.current_route()
-        if current_route is not None:
-            first_calculation = current_route.created_at
+        if packet.current_route_created_at is not None:
+            first_calculation = packet.current_route_created_at
 
         # How many days have we been looking for a route?
         calculation_days = last_calculation - first_calculation
@@ -513,7 +535,9 @@ def recalculate_missing_routes(packets: List[Packet], starting_date: datetime.da
             # Wait before retrying this calculation.
             continue
 
-        if current_route is None:
+        if packet.current_route_id is None:
             create_new_route(packet, starting_date.date())
         else:
-            check_and_recalculate_route(current_route, starting_date.date())
+            check_and_recalculate_route(
+                Route.objects.get(id=packet.current_route_id), starting_date.date()
+            )
@@ -20,7 +20,13 @@ from django_jinja.builtins import DEFAULT_EXTENSIONS
 from django.utils.translation import gettext_lazy as _
 
 from turtlemail import __version__
-from turtlemail.base.env import get_env, get_env_list, is_env_true, parse_channel_layers
+from turtlemail.base.env import (
+    get_env,
+    get_env_list,
+    is_env_true,
+    parse_caches,
+    parse_channel_layers,
+)
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -43,6 +49,13 @@ SECRET_KEY = get_env("SECRET_KEY", default=None)
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = is_env_true("DEBUG")
 
+# Permutes the packet codes. Unlike SECRET_KEY it must never change, or new
+# codes might already be in use. Checked by turtlemail.checks if it's unset.
+HUMAN_ID_KEY = get_env(
+    "HUMAN_ID_KEY",
+    default="not-a-very-secret-key" if DEBUG or "test" in sys.argv else None,
+)
+
 ALLOWED_HOSTS = get_env_list("ALLOWED_HOSTS")
 CSRF_TRUSTED_ORIGINS = get_env_list(
     "CSRF_TRUSTED_ORIGINS",
@@ -92,6 +105,11 @@ TEMPLATES = [
                 *DEFAULT_EXTENSIONS,
             ],
             "auto_reload": DEBUG,
+            "environment": "turtlemail.base.jinja.Environment",
+            "bytecode_cache": {
+                "enabled": is_env_true("JINJA_BYTECODE_CACHE", default=True),
+                "backend": "turtlemail.base.jinja.FileSystemBytecodeCache",
+            },
             "context_processors": [
                 "django.contrib.messages.context_processors.messages",
             ],
@@ -120,11 +138,21 @@ SESSION_COOKIE_AGE = get_env("SESSION_TIMEOUT_SECONDS", cast=int, default=120960
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Connections are kept open for DATABASE_CONN_MAX_AGE seconds and checked
+# before they're reused, so tasks don't pay for setting up a new connection
+# each time. It must stay 0 for the ASGI server, which runs every request in
+# a new thread and would leave its connection open (Django ticket #33497).
+# docker/entrypoint.sh only enables it for huey. Set
+# DATABASE_DISABLE_SERVER_SIDE_CURSORS when connecting through a
+# transaction pooler like PgBouncer.
 DATABASES = {
     "default": dj_database_url.config(
         "DATABASE_URL",
         f"sqlite:///{DATA_DIR / 'db.sqlite'}",
         engine="django.contrib.gis.db.backends.postgis",
+        conn_max_age=get_env("DATABASE_CONN_MAX_AGE", cast=int, default=0),
+        conn_health_checks=is_env_true("DATABASE_CONN_HEALTH_CHECKS", default=True),
+        disable_server_side_cursors=is_env_true("DATABASE_DISABLE_SERVER_SIDE_CURSORS"),
     )
 }
 
@@ -265,6 +293,9 @@ HUEY = {
     },
 }
 
+# shared cache, needs its own Redis database: clearing it mustn't drop huey tasks
+CACHES = parse_caches("CACHE_URL", default="memory://")
+
 # WARNING: don’t add configuration settings after this line
 try:
     sys.path.insert(0, "/etc/turtlemail")
@@ -287,6 +318,37 @@ if SENTRY_DSN:
 
 
 ACTIVITY_LENGTH = 3
+DELIVERIES_PAGE_LENGTH = get_env("DELIVERIES_PAGE_LENGTH", cast=int, default=20)
+CHAT_PAGE_LENGTH = get_env("CHAT_PAGE_LENGTH", cast=int, default=30)
 ROUTING_REQUEST_NOTIFICATION_INTERVAL = get_env(
     "ROUTING_REQUEST_NOTIFICATION_INTERVAL", cast=int, default=48
 )  # after how many hours a notification mail is resent for an open routing request
+# notifications are merged into one email per user within this many minutes
+NOTIFICATION_DIGEST_WINDOW = get_env("NOTIFICATION_DIGEST_WINDOW", cast=int, default=60)
+NOTIFICATION_DIGEST_BATCH_SIZE = get_env(
+    "NOTIFICATION_DIGEST_BATCH_SIZE", cast=int, default=500
+)
+
+JINJA_BYTECODE_CACHE_DIR = get_env(
+    "JINJA_BYTECODE_CACHE_DIR", cast=Path, default=DATA_DIR / "cache" / "jinja"
+)
+# renders taking at least this many seconds are logged as warnings
+TEMPLATE_SLOW_RENDER_SECONDS = get_env(
+    "TEMPLATE_SLOW_RENDER_SECONDS", cast=float, default=0.5
+)
+
+# how long computed page fragments are cached at most, see turtlemail.cache
+CACHE_FRAGMENT_TIMEOUT = get_env("CACHE_FRAGMENT_TIMEOUT", cast=int, default=3600)
+
+# bearer token for scraping /-/metrics, which is disabled if empty
+METRICS_TOKEN = get_env("METRICS_TOKEN", default="")
+
+# emails are queued in the database and sent in batches by a background task
+EMAIL_OUTBOX_BATCH_SIZE = get_env("EMAIL_OUTBOX_BATCH_SIZE", cast=int, default=100)
+EMAIL_OUTBOX_MAX_ATTEMPTS = get_env("EMAIL_OUTBOX_MAX_ATTEMPTS", cast=int, default=5)
+# delay before the first retry, doubled for each further one
+EMAIL_OUTBOX_RETRY_DELAY = timedelta(
+    seconds=get_env("EMAIL_OUTBOX_RETRY_DELAY_SECONDS", cast=int, default=60)
+)
+# maximum number of emails sent per second, 0 for no limit
+EMAIL_OUTBOX_RATE_LIMIT = get_env("EMAIL_OUTBOX_RATE_LIMIT", cast=float, default=5)
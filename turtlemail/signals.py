@@ -0,0 +1,48 @@
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+
+from turtlemail.cache import (
+    invalidate_chat,
+    invalidate_deleted_packets,
+    invalidate_packets,
+)
+from turtlemail.models import (
+    ChatMessage,
+    Packet,
+    Route,
+    RouteStep,
+    SystemChatMessage,
+    UserChatMessage,
+)
+
+
+@receiver(post_save, sender=Packet)
+def packet_saved(sender, instance: Packet, raw=False, **kwargs):
+    if not raw:
+        invalidate_packets(instance.pk)
+
+
+@receiver(pre_delete, sender=Packet)
+def packet_deleted(sender, instance: Packet, **kwargs):
+    invalidate_deleted_packets(instance.pk)
+
+
+@receiver(post_save, sender=Route)
+@receiver(post_save, sender=RouteStep)
+def route_saved(sender, instance: Route | RouteStep, raw=False, **kwargs):
+    if not raw:
+        invalidate_packets(instance.packet_id)
+
+
+@receiver(pre_delete, sender=Route)
+@receiver(pre_delete, sender=RouteStep)
+def route_deleted(sender, instance: Route | RouteStep, **kwargs):
+    invalidate_deleted_packets(instance.packet_id)
+
+
+@receiver(post_save, sender=ChatMessage)
+@receiver(post_save, sender=UserChatMessage)
+@receiver(post_save, sender=SystemChatMessage)
+def chat_message_changed(sender, instance: ChatMessage, raw=False, **kwargs):
+    if not raw:
+        invalidate_chat(instance.route_step_id)
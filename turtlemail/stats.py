@@ -1,8 +1,11 @@
+import datetime
 from typing import TypedDict
-import statistics
 
-from django.db.models import Q, Min, Max, Count
-from turtlemail.models import User, Packet, RouteStep
+from django.db.models import Aggregate, Count, Exists, FloatField, Max, Min, OuterRef, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from turtlemail.models import DailyStats, Packet, RouteStep, User
 
 
 class StayStats(TypedDict):
@@ -21,6 +24,15 @@ class AccountStats(TypedDict):
     total_number: int
 
 
+class Median(Aggregate):
+    """The median of the values, interpolated between the middle two if needed."""
+
+    function = "PERCENTILE_CONT"
+    name = "Median"
+    template = "%(function)s(0.5) WITHIN GROUP (ORDER BY %(expressions)s)"
+    output_field = FloatField()
+
+
 def get_account_stats() -> AccountStats:
     return {
         "total_number": User.objects.all().count(),
@@ -31,30 +43,108 @@ def get_stay_stats() -> StayStats:
     users = User.objects.annotate(
         stay_count=Count("stay", filter=Q(stay__deleted=False))
     )
-    stays = users.aggregate(min=Min("stay_count"), max=Max("stay_count"))
-    return {
-        "min": stays["min"],
-        "max": stays["max"],
-        "median": statistics.median(users.values_list("stay_count", flat=True)),
-    }
+    stays = users.aggregate(
+        min=Min("stay_count"), max=Max("stay_count"), median=Median("stay_count")
+    )
+    # Like statistics.median(), only interpolated medians are floats
+    if stays["median"] is not None and stays["median"].is_integer():
+        stays["median"] = int(stays["median"])
+    return stays
 
 
 def get_packet_stats() -> PackageStats:
-    # TODO: needs tests
-    no_route_packets = Packet.objects.without_valid_route()
-    packets_with_route = Packet.objects.exclude(
-        id__in=no_route_packets.values_list("id", flat=True)
+    waiting = Packet.objects.without_valid_route().count()
+    packets_with_route = Packet.objects.with_routing_state().filter(
+        current_route_id__isnull=False, outdated_steps=0
     )
-    completed_route_steps = RouteStep.objects.filter(
-        status=RouteStep.COMPLETED
-    ).values_list("id", flat=True)
-    delivered_packets = packets_with_route.filter(
-        all_routes__steps__in=completed_route_steps
-    ).distinct()
-    delivered_packets_count = delivered_packets.count()
+    delivered = packets_with_route.filter(
+        Exists(
+            RouteStep.objects.filter(
+                route__packet=OuterRef("pk"), status=RouteStep.COMPLETED
+            )
+        )
+    ).count()
 
     return {
-        "waiting": no_route_packets.count(),
-        "in_transit": packets_with_route.count() - delivered_packets_count,
-        "delivered": delivered_packets_count,
+        "waiting": waiting,
+        "in_transit": packets_with_route.count() - delivered,
+        "delivered": delivered,
     }
+
+
+def _count_per_day(queryset, field: str, since: datetime.date) -> dict:
+    return dict(
+        queryset.filter(**{f"{field}__date__gte": since})
+        .annotate(day=TruncDate(field))
+        .order_by()
+        .values("day")
+        .annotate(count=Count("id"))
+        .values_list("day", "count")
+    )
+
+
+def update_daily_stats(today: datetime.date | None = None):
+    """
+    Roll up the days since the last update, and record the current state
+    for today. Only the activity since the last update is counted.
+    """
+    today = today or timezone.localdate()
+    # The last day might have been rolled up before it was over
+    since = DailyStats.objects.aggregate(last=Max("date"))["last"]
+    if since is None:
+        first_account = User.objects.aggregate(first=Min("date_joined"))["first"]
+        since = timezone.localdate(first_account) if first_account else today
+
+    new_accounts = _count_per_day(User.objects, "date_joined", since)
+    new_packets = _count_per_day(Packet.objects, "created_at", since)
+    days = [since + datetime.timedelta(days=i) for i in range((today - since).days + 1)]
+    DailyStats.objects.bulk_create(
+        (
+            DailyStats(
+                date=day,
+                new_accounts=new_accounts.get(day, 0),
+                new_packets=new_packets.get(day, 0),
+            )
+            for day in days
+        ),
+        update_conflicts=True,
+        unique_fields=["date"],
+        update_fields=["new_accounts", "new_packets"],
+    )
+
+    packets = get_packet_stats()
+    stays = get_stay_stats()
+    DailyStats.objects.filter(date=today).update(
+        accounts=get_account_stats()["total_number"],
+        packets_waiting=packets["waiting"],
+        packets_in_transit=packets["in_transit"],
+        packets_delivered=packets["delivered"],
+        stays_min=stays["min"],
+        stays_max=stays["max"],
+        stays_median=stays["median"],
+    )
+
+
+def get_daily_stats(
+    since: datetime.date | None = None, until: datetime.date | None = None
+) -> list[dict]:
+    days = DailyStats.objects.order_by("date")
+    if since is not None:
+        days = days.filter(date__gte=since)
+    if until is not None:
+        days = days.filter(date__lte=until)
+    return [
+        {**day, "date": day["date"].isoformat()}
+        for day in days.values(
+            "date",
+            "new_accounts",
+            "new_packets",
+            "accounts",
+            "packets_waiting",
+            "packets_in_transit",
+            "packets_delivered",
+            "stays_min",
+            "stays_max",
+            "stays_median",
+        )
+    ]
@@ -1,9 +1,42 @@
 import enum
 from django.contrib.gis.geos import Point
 
+from turtlemail.models import Location, Packet, Route, RouteStep, Stay, User
+
 
 class TestLocations(enum.Enum):
     HAMBURG = Point(9.58292, 53.33145)
     BERLIN = Point(13.431700, 52.592879)
     MUNICH = Point(11.33371, 48.08565)
     BREMEN = Point(53.04052, 8.56428)
+
+
+def create_route_steps(
+    sender: User, recipient: User, *users: User, human_id="test_id", **kwargs
+) -> list[RouteStep]:
+    """
+    Create a packet with a current route through a new stay of each of the
+    users. The steps are linked to each other and get the same kwargs,
+    like status.
+
+    They're created in bulk, bypassing RouteStep.save(), which would
+    start the delivery.
+    """
+    packet = Packet.objects.create(
+        sender=sender, recipient=recipient, human_id=human_id
+    )
+    route = Route.objects.create(packet=packet, status=Route.CURRENT)
+    steps = []
+    for position, user in enumerate(users):
+        location = Location.objects.create(is_home=False, point=Point(0, 0), user=user)
+        stay = Stay.objects.create(location=location, user=user)
+        steps.append(
+            RouteStep(
+                stay=stay, packet=packet, route=route, position=position, **kwargs
+            )
+        )
+    steps = RouteStep.objects.bulk_create(steps)
+    for step, next_step in zip(steps, steps[1:]):
+        step.next_step = next_step
+    RouteStep.objects.bulk_update(steps[:-1], ["next_step"])
+    return steps
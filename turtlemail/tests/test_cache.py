@@ -0,0 +1,70 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from turtlemail.cache import cached, invalidate
+from turtlemail.models import RouteStep, User, UserChatMessage
+from turtlemail.tests import create_route_steps
+
+
+class CacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.computed = 0
+        self.giver = User.objects.create(email="giver@turtlemail.app", username="giver")
+        self.taker = User.objects.create(email="taker@turtlemail.app", username="taker")
+
+    def compute(self):
+        self.computed += 1
+        return self.computed
+
+    def get(self, *scopes):
+        return cached(("test",), scopes, self.compute)
+
+    def test_cached(self):
+        self.assertEqual(1, self.get(("chats", 1)))
+        self.assertEqual(1, self.get(("chats", 1)))
+        invalidate(("chats", 2))
+        self.assertEqual(1, self.get(("chats", 1)))
+        invalidate(("chats", 1))
+        self.assertEqual(2, self.get(("chats", 1)))
+
+    def test_evicted_version(self):
+        self.assertEqual(1, self.get(("chats", 1)))
+        cache.delete("version:chats:1")
+        self.assertEqual(2, self.get(("chats", 1)))
+
+    def test_model_changes(self):
+        step, _next_step = create_route_steps(
+            self.giver, self.taker, self.giver, self.taker, status=RouteStep.SUGGESTED
+        )
+        packet = step.packet
+
+        self.assertEqual(1, self.get(("deliveries", self.taker.pk)))
+        # Only invalidated once everything is committed
+        with self.captureOnCommitCallbacks(execute=True):
+            step.status = RouteStep.ACCEPTED
+            step.save()
+            self.assertEqual(1, self.get(("deliveries", self.taker.pk)))
+        self.assertEqual(2, self.get(("deliveries", self.taker.pk)))
+
+        self.assertEqual(3, self.get(("chats", self.taker.pk)))
+        UserChatMessage.objects.create(
+            author=self.giver, route_step=step, content="Hello"
+        )
+        self.assertEqual(4, self.get(("chats", self.taker.pk)))
+
+        self.assertEqual(5, self.get(("packet", packet.pk)))
+        with self.captureOnCommitCallbacks(execute=True):
+            packet.cancel()
+        self.assertEqual(6, self.get(("packet", packet.pk)))
+
+        # edits without a status change, like in the admin
+        with self.captureOnCommitCallbacks(execute=True):
+            step.remaining_distance = 1.5
+            step.save()
+        self.assertEqual(7, self.get(("deliveries", self.taker.pk)))
+
+        # and deletes
+        with self.captureOnCommitCallbacks(execute=True):
+            step.route.delete()
+        self.assertEqual(8, self.get(("deliveries", self.taker.pk)))
@@ -0,0 +1,188 @@
+from datetime import date
+
+from django.test import TestCase, override_settings
+
+from turtlemail.models import (
+    ChatMessage,
+    NotificationEvent,
+    RouteStep,
+    SystemChatMessage,
+    UnreadChatCounter,
+    User,
+    UserChatMessage,
+)
+from turtlemail.notification_service import NotificationService
+from turtlemail.tests import create_route_steps
+from turtlemail.views import ChatsView, chat_history_context
+
+
+class ChatTestCase(TestCase):
+    def setUp(self):
+        self.giver = User.objects.create(email="giver@turtlemail.app", username="giver")
+        self.taker = User.objects.create(email="taker@turtlemail.app", username="taker")
+        self.step, self.last_step = create_route_steps(
+            self.giver,
+            self.taker,
+            self.giver,
+            self.taker,
+            end=date(2024, 6, 5),
+            status=RouteStep.ACCEPTED,
+        )
+
+    def test_chat_message_event(self):
+        message = UserChatMessage.objects.create(
+            author=self.giver, route_step=self.step, content="Hello"
+        )
+
+        event = NotificationService.chat_message_event(message)
+        self.assertEqual(message.pk, event["message_id"])
+        self.assertEqual(self.giver.pk, event["author_id"])
+        self.assertIn("chat-end", event["html"]["own"])
+        self.assertIn("chat-start", event["html"]["other"])
+
+    def test_sequence(self):
+        NotificationService.send_system_chat_messages(
+            RouteStep.objects.filter(id=self.step.id).select_related("stay__location"),
+            SystemChatMessage.SystemMessages.NEW_HANDOVER_CHAT,
+        )
+        for content in ("Hello", "Hi"):
+            UserChatMessage.objects.create(
+                author=self.giver, route_step=self.step, content=content
+            )
+
+        self.assertEqual(
+            [1, 2, 3],
+            list(
+                ChatMessage.objects.filter(route_step=self.step).values_list(
+                    "sequence", flat=True
+                )
+            ),
+        )
+        self.step.refresh_from_db()
+        self.assertEqual(3, self.step.chat_sequence)
+
+    def test_notify_messages_read(self):
+        for content in ("Hello", "Are you there?"):
+            UserChatMessage.objects.create(
+                author=self.giver, route_step=self.step, content=content
+            )
+        UserChatMessage.objects.create(
+            author=self.taker, route_step=self.step, content="Hi"
+        )
+
+        # Select the messages, then update them and the counter in a savepoint
+        with self.assertNumQueries(5):
+            NotificationService.notify_messages_read(self.taker, self.step)
+        self.assertEqual(
+            [
+                ChatMessage.StatusChoices.RECEIVED,
+                ChatMessage.StatusChoices.RECEIVED,
+                ChatMessage.StatusChoices.NEW,
+            ],
+            list(
+                ChatMessage.objects.filter(route_step=self.step).values_list(
+                    "status", flat=True
+                )
+            ),
+        )
+
+        # Nothing left to mark as read
+        with self.assertNumQueries(1):
+            NotificationService.notify_messages_read(self.taker, self.step)
+
+    @override_settings(CHAT_PAGE_LENGTH=2)
+    def test_chat_history(self):
+        for content in ("Hello", "Hi", "How are you?"):
+            UserChatMessage.objects.create(
+                author=self.giver, route_step=self.step, content=content
+            )
+
+        cx = chat_history_context(self.step, cursor=None)
+        self.assertEqual([2, 3], [msg.sequence for msg in cx["chat_msgs"]])
+        self.assertIsInstance(cx["chat_msgs"][0], UserChatMessage)
+
+        cx = chat_history_context(self.step, cx["chat_msgs_cursor"])
+        self.assertEqual([1], [msg.sequence for msg in cx["chat_msgs"]])
+        self.assertIsNone(cx["chat_msgs_cursor"])
+
+    def test_chat_list(self):
+        # Chats only show up once they have messages
+        self.assertEqual([], ChatsView.get_chat_list_context(self.giver))
+
+        UserChatMessage.objects.create(
+            author=self.giver, route_step=self.step, content="Hello"
+        )
+        with self.assertNumQueries(1):
+            giver_chats = ChatsView.get_chat_list_context(self.giver)
+        with self.assertNumQueries(1):
+            taker_chats = ChatsView.get_chat_list_context(
+                self.taker, active_chat=self.step
+            )
+
+        self.assertEqual([self.step.pk], [chat["step_id"] for chat in giver_chats])
+        self.assertFalse(giver_chats[0]["updated"])
+        self.assertEqual([self.step.pk], [chat["step_id"] for chat in taker_chats])
+        self.assertTrue(taker_chats[0]["updated"])
+        self.assertTrue(taker_chats[0]["active"])
+
+    def unread_counts(self):
+        return dict(
+            UnreadChatCounter.objects.filter(route_step=self.step).values_list(
+                "user__username", "count"
+            )
+        )
+
+    def test_unread_counter(self):
+        for content in ("Hello", "Are you there?"):
+            UserChatMessage.objects.create(
+                author=self.giver, route_step=self.step, content=content
+            )
+        UserChatMessage.objects.create(
+            author=self.taker, route_step=self.step, content="Hi"
+        )
+        self.assertEqual({"giver": 1, "taker": 2}, self.unread_counts())
+
+        # a message counted while the others were being read stays unread
+        UnreadChatCounter.objects.filter(user=self.taker).update(count=3)
+        NotificationService.notify_messages_read(self.taker, self.step)
+        self.assertEqual({"giver": 1, "taker": 1}, self.unread_counts())
+
+        UnreadChatCounter.objects.update(count=42)
+        self.assertEqual(1, UnreadChatCounter.recompute())
+        self.assertEqual({"giver": 1}, self.unread_counts())
+
+        # a counter that drifted too low doesn't go below zero
+        UserChatMessage.objects.create(
+            author=self.taker, route_step=self.step, content="Still there?"
+        )
+        UnreadChatCounter.objects.filter(user=self.giver).update(count=1)
+        NotificationService.notify_messages_read(self.giver, self.step)
+        self.assertEqual({"giver": 0}, self.unread_counts())
+
+    def test_final_step(self):
+        message = UserChatMessage.objects.create(
+            author=self.taker, route_step=self.last_step, content="Got it"
+        )
+        self.assertIsNone(message.recipient_id())
+        self.assertFalse(UnreadChatCounter.objects.exists())
+
+    def test_queue_chat_notifications(self):
+        for content in ("Hello", "Are you there?"):
+            UserChatMessage.objects.create(
+                author=self.giver, route_step=self.step, content=content
+            )
+        UserChatMessage.objects.create(
+            author=self.taker, route_step=self.step, content="Hi"
+        )
+        self.taker.settings.wants_email_notifications_chat = False
+        self.taker.settings.save()
+
+        NotificationService.queue_chat_notifications()
+
+        self.assertEqual(
+            [(self.giver.pk, self.step.pk)],
+            list(NotificationEvent.objects.values_list("user", "route_step")),
+        )
+        self.assertFalse(
+            ChatMessage.objects.filter(status=ChatMessage.StatusChoices.NEW).exists()
+        )
@@ -0,0 +1,121 @@
+import datetime
+from unittest import mock
+
+from django.test import RequestFactory, TestCase, override_settings
+
+from turtlemail.models import (
+    DeliveryLog,
+    Location,
+    Packet,
+    Route,
+    RouteStep,
+    Stay,
+    User,
+)
+from turtlemail.tests import TestLocations
+from turtlemail.views import DeliveriesView, delivery_logs_context
+
+
+@override_settings(DELIVERIES_PAGE_LENGTH=3)
+class DeliveriesViewTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="user@turtlemail.app", username="user")
+        self.other = User.objects.create(email="other@turtlemail.app", username="other")
+        location = Location.objects.create(
+            is_home=False, point=TestLocations.HAMBURG.value, user=self.user
+        )
+        self.stay = Stay.objects.create(
+            location=location, user=self.user, frequency=Stay.DAILY
+        )
+
+        Packet.objects.create(sender=self.user, recipient=self.other, human_id="sent")
+        Packet.objects.create(
+            sender=self.other, recipient=self.user, human_id="received"
+        )
+        self.carried_packet("carried", Route.CURRENT)
+        self.carried_packet("carried_before", Route.CANCELLED)
+        # A packet that doesn't involve the user at all
+        Packet.objects.create(
+            sender=self.other, recipient=self.other, human_id="unrelated"
+        )
+
+    def carried_packet(self, human_id: str, route_status: str):
+        packet = Packet.objects.create(
+            sender=self.other, recipient=self.other, human_id=human_id
+        )
+        route = Route.objects.create(packet=packet, status=route_status)
+        RouteStep.objects.bulk_create(
+            [
+                RouteStep(
+                    stay=self.stay,
+                    packet=packet,
+                    route=route,
+                    status=RouteStep.SUGGESTED,
+                )
+            ]
+        )
+        return packet
+
+    def get_page(self, cursor=None):
+        query = {"cursor": cursor} if cursor else {}
+        view = DeliveriesView()
+        view.setup(RequestFactory().get("/deliveries", query))
+        view.request.user = self.user
+        return view.get_queryset(), view.page
+
+    def test_pages(self):
+        with self.assertNumQueries(1):
+            first_page, page = self.get_page()
+            for packet in first_page:
+                packet.status()
+            involvement = [packet.is_user_involved for packet in first_page]
+
+        self.assertEqual(
+            ["carried_before", "carried", "received"],
+            [packet.human_id for packet in first_page],
+        )
+        self.assertEqual([False, True, False], involvement)
+        self.assertTrue(page.has_more)
+
+        second_page, page = self.get_page(page.next_cursor)
+        self.assertEqual(["sent"], [packet.human_id for packet in second_page])
+        self.assertFalse(page.has_more)
+
+    def test_cached_status(self):
+        def received_status():
+            first_page, _page = self.get_page()
+            (received,) = [p for p in first_page if p.human_id == "received"]
+            return received.status()
+
+        self.assertEqual(Packet.Status.CALCULATING_ROUTE, received_status())
+
+        # A month later the cached page has a different status
+        later = datetime.datetime.now(datetime.UTC) + datetime.timedelta(days=31)
+        with (
+            mock.patch("turtlemail.models.datetime", wraps=datetime) as now,
+            self.assertNumQueries(0),
+        ):
+            now.datetime.now.return_value = later
+            self.assertEqual(Packet.Status.NO_ROUTE_FOUND, received_status())
+
+
+@override_settings(ACTIVITY_LENGTH=2)
+class DeliveryLogsTestCase(TestCase):
+    def test_pages(self):
+        user = User.objects.create(email="user@turtlemail.app", username="user")
+        packet = Packet.objects.create(sender=user, recipient=user, human_id="packet")
+        logs = [
+            DeliveryLog.objects.create(
+                packet=packet, action=DeliveryLog.SEARCHING_ROUTE
+            )
+            for _ in range(3)
+        ]
+
+        with self.assertNumQueries(1):
+            cx = delivery_logs_context(packet, cursor=None)
+        self.assertEqual([logs[2], logs[1]], cx["delivery_logs"])
+        self.assertTrue(cx["has_more_delivery_logs"])
+
+        cx = delivery_logs_context(packet, cx["next_delivery_logs_cursor"])
+        self.assertEqual([logs[0]], cx["delivery_logs"])
+        self.assertFalse(cx["has_more_delivery_logs"])
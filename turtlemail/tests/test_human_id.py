@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from turtlemail.checks import check_human_id_key
+from turtlemail.human_id import dictionary
+from turtlemail.human_id.human_id import ID_COUNT, decode, encode
+from turtlemail.models import Packet, User
+
+
+class HumanIdTestCase(SimpleTestCase):
+    def test_encode(self):
+        ids = [encode(number, "key") for number in range(1000)]
+        self.assertEqual(1000, len(set(ids)))
+        for number, human_id in enumerate(ids):
+            self.assertEqual(number, decode(human_id, "key"))
+            # random IDs from generate_id() start with a color
+            self.assertNotIn(human_id.split("-")[0], dictionary.colors)
+
+        self.assertEqual(ID_COUNT - 1, decode(encode(ID_COUNT - 1, "key"), "key"))
+        self.assertNotEqual(encode(1, "key"), encode(1, "other key"))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            encode(ID_COUNT, "key")
+        for human_id in ("", "red-bold-cat", "cat-cat-cat-cat", "a-b-c-d-e"):
+            with self.subTest(human_id), self.assertRaises(ValueError):
+                decode(human_id, "key")
+
+    @override_settings(HUMAN_ID_KEY=None)
+    def test_missing_key(self):
+        self.assertEqual(
+            ["turtlemail.E001"], [error.id for error in check_human_id_key(None)]
+        )
+
+
+class PacketHumanIdTestCase(TestCase):
+    def test_create_with_human_id(self):
+        user = User.objects.create(email="user@turtlemail.app", username="user")
+        legacy = Packet.objects.create(
+            sender=user, recipient=user, human_id="red-bold-bold-cat"
+        )
+        packet = Packet.objects.create_with_human_id(sender=user, recipient=user)
+
+        self.assertEqual(packet.pk, decode(packet.human_id, settings.HUMAN_ID_KEY))
+        self.assertEqual(packet, Packet.objects.get_by_natural_key(packet.human_id))
+        self.assertEqual(legacy, Packet.objects.get_by_natural_key(legacy.human_id))
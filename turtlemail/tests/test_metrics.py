@@ -0,0 +1,83 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from turtlemail import metrics
+
+
+class MetricsTestCase(SimpleTestCase):
+    def create(self, metric_class, name: str, *args, **kwargs):
+        metric = metric_class(f"test_{self._testMethodName}_{name}", *args, **kwargs)
+        self.addCleanup(metrics._REGISTRY.remove, metric)
+        return metric
+
+    def test_expose(self):
+        counter = self.create(metrics.Counter, "total", "A counter", ["result"])
+        counter.inc(result="ok")
+        counter.inc(2, result="ok")
+        counter.inc(result='"failed"')
+        gauge = self.create(metrics.Gauge, "gauge", "A gauge")
+        gauge.set(5)
+        gauge.dec()
+        histogram = self.create(
+            metrics.Histogram, "seconds", "A histogram", buckets=(1, 5)
+        )
+        histogram.observe(0.5)
+        histogram.observe(3)
+        histogram.observe(10)
+
+        text = metrics.expose()
+
+        self.assertIn(
+            "# HELP test_test_expose_total A counter\n"
+            "# TYPE test_test_expose_total counter\n"
+            'test_test_expose_total{result="\\"failed\\""} 1.0\n'
+            'test_test_expose_total{result="ok"} 3.0\n',
+            text,
+        )
+        self.assertIn("test_test_expose_gauge 4.0\n", text)
+        self.assertIn(
+            "# TYPE test_test_expose_seconds histogram\n"
+            'test_test_expose_seconds_bucket{le="1.0"} 1.0\n'
+            'test_test_expose_seconds_bucket{le="5.0"} 2.0\n'
+            'test_test_expose_seconds_bucket{le="+Inf"} 3.0\n'
+            "test_test_expose_seconds_count 3.0\n"
+            "test_test_expose_seconds_sum 13.5\n",
+            text,
+        )
+
+    def test_per_process(self):
+        gauge = self.create(metrics.Gauge, "gauge", "A gauge", per_process=True)
+        with mock.patch("turtlemail.metrics._process", return_value="other:1"):
+            gauge.inc(2)
+        gauge.inc()
+        self.assertIn("test_test_per_process_gauge 3.0\n", metrics.expose())
+
+        # restarted without closing its sockets
+        with mock.patch("turtlemail.metrics._process", return_value="other:1"):
+            gauge.reset()
+        self.assertIn("test_test_per_process_gauge 1.0\n", metrics.expose())
+
+    def test_labels(self):
+        counter = self.create(metrics.Counter, "total", "A counter", ["result"])
+        with self.assertRaises(ValueError):
+            counter.inc(outcome="ok")
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_view(self):
+        url = reverse("metrics")
+        self.assertEqual(401, self.client.get(url).status_code)
+        self.assertEqual(
+            401,
+            self.client.get(url, headers={"Authorization": "Bearer no"}).status_code,
+        )
+        response = self.client.get(url, headers={"Authorization": "Bearer secret"})
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            "text/plain; version=0.0.4; charset=utf-8", response["Content-Type"]
+        )
+        self.assertIn("# TYPE turtlemail_emails_total counter", response.text)
+
+    def test_view_disabled(self):
+        self.assertEqual(404, self.client.get(reverse("metrics")).status_code)
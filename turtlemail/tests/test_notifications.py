@@ -0,0 +1,138 @@
+from datetime import date, timedelta
+
+from django.test import TestCase
+from django.utils import timezone, translation
+
+from turtlemail.models import (
+    NotificationEvent,
+    OutgoingEmail,
+    RouteStep,
+    UnreadChatCounter,
+    User,
+    UserSettings,
+)
+from turtlemail.notification_service import NotificationService
+from turtlemail.tests import create_route_steps
+
+
+class NotificationsTestCase(TestCase):
+    def setUp(self):
+        self.sender = User.objects.create(
+            email="sender@turtlemail.app", username="sender"
+        )
+
+    def create_user(self, username: str) -> User:
+        return User.objects.create(
+            email=f"{username}@turtlemail.app", username=username
+        )
+
+    def create_step(
+        self, user: User, human_id: str, status=RouteStep.SUGGESTED, **kwargs
+    ) -> RouteStep:
+        (step,) = create_route_steps(
+            self.sender, self.sender, user, human_id=human_id, status=status, **kwargs
+        )
+        return step
+
+    def test_queue_requests_notifications(self):
+        users = [self.create_user(f"user{i}") for i in range(3)]
+        for i, user in enumerate(users):
+            self.create_step(user, f"packet{i}")
+        # reminded recently, but there's a new request as well
+        self.create_step(
+            users[0], "reminded", notified_at=timezone.now() - timedelta(hours=1)
+        )
+        # only reminded recently
+        self.create_step(
+            self.create_user("reminded"),
+            "reminded_only",
+            notified_at=timezone.now() - timedelta(hours=1),
+        )
+        unwilling = self.create_user("unwilling")
+        unwilling.settings.wants_email_notifications_requests = False
+        unwilling.settings.save()
+        self.create_step(unwilling, "unwilling")
+
+        NotificationService.queue_requests_notifications()
+
+        self.assertEqual(
+            ["packet0", "reminded", "packet1", "packet2"],
+            list(
+                NotificationEvent.objects.order_by("user", "route_step").values_list(
+                    "route_step__packet__human_id", flat=True
+                )
+            ),
+        )
+        self.assertFalse(
+            RouteStep.objects.filter(
+                stay__user__in=users, notified_at__isnull=True
+            ).exists()
+        )
+
+        # everyone has been reminded now
+        NotificationService.queue_requests_notifications()
+        self.assertEqual(4, NotificationEvent.objects.count())
+
+    def queue_notifications(self, user: User, human_id: str):
+        NotificationEvent.objects.create(
+            user=user,
+            route_step=self.create_step(user, human_id),
+            kind=NotificationEvent.Kind.ROUTING_REQUEST,
+        )
+        taker = self.create_user(f"{human_id}_taker")
+        chat_step, _next_step = create_route_steps(
+            self.sender,
+            self.sender,
+            user,
+            taker,
+            human_id=f"{human_id}_chat",
+            status=RouteStep.ACCEPTED,
+            end=date(2024, 6, 5),
+        )
+        NotificationEvent.objects.create(
+            user=user, route_step=chat_step, kind=NotificationEvent.Kind.CHAT_MESSAGE
+        )
+        UnreadChatCounter.objects.create(user=user, route_step=chat_step, count=1)
+
+    def test_send_notification_digests(self):
+        users = [self.create_user(f"user{i}") for i in range(3)]
+        for i, user in enumerate(users):
+            self.queue_notifications(user, f"packet{i}")
+        # answered the request before the digest went out
+        answered = self.create_user("answered")
+        NotificationEvent.objects.create(
+            user=answered,
+            route_step=self.create_step(answered, "answered", RouteStep.ACCEPTED),
+            kind=NotificationEvent.Kind.ROUTING_REQUEST,
+        )
+        # read the chat before the digest went out
+        read = self.create_user("read")
+        self.queue_notifications(read, "read")
+        NotificationEvent.objects.filter(
+            user=read, kind=NotificationEvent.Kind.ROUTING_REQUEST
+        ).delete()
+        UnreadChatCounter.objects.filter(user=read).update(count=0)
+
+        # select, and insert, delete and update within a savepoint
+        with translation.override("en"), self.assertNumQueries(6):
+            NotificationService.send_notification_digests()
+
+        emails = list(OutgoingEmail.objects.order_by("recipient"))
+        self.assertEqual(
+            [user.email for user in users], [email.recipient for email in emails]
+        )
+        self.assertEqual("You've news in your turtlemail account.", emails[0].subject)
+        self.assertIn("packet0\n", emails[0].body)
+        self.assertIn("Package handover to packet0_taker", emails[0].body)
+        self.assertFalse(NotificationEvent.objects.exists())
+
+        # the next digest has to wait for the window to pass
+        self.queue_notifications(users[0], "later")
+        NotificationService.send_notification_digests()
+        self.assertEqual(3, OutgoingEmail.objects.count())
+
+        UserSettings.objects.update(
+            notification_digest_sent_at=timezone.now() - timedelta(hours=2)
+        )
+        NotificationService.send_notification_digests()
+        self.assertEqual(4, OutgoingEmail.objects.count())
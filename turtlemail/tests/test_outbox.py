@@ -0,0 +1,73 @@
+import datetime
+from unittest import mock
+
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from turtlemail.models import OutgoingEmail
+from turtlemail.outbox import queue_mail, send_queued_mails
+
+
+@override_settings(EMAIL_OUTBOX_RATE_LIMIT=0)
+class OutboxTestCase(TestCase):
+    def test_send_queued_mails(self):
+        queue_mail("Hello", "Hello you", None, ["a@turtlemail.app", "b@turtlemail.app"])
+        self.assertEqual([], mail.outbox)
+
+        with mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.open"
+        ) as open_connection:
+            self.assertEqual(2, send_queued_mails())
+        open_connection.assert_called_once()
+
+        self.assertEqual(
+            [["a@turtlemail.app"], ["b@turtlemail.app"]], [m.to for m in mail.outbox]
+        )
+        self.assertFalse(
+            OutgoingEmail.objects.exclude(status=OutgoingEmail.Status.SENT).exists()
+        )
+        # Nothing left to send
+        self.assertEqual(0, send_queued_mails())
+
+    @override_settings(
+        EMAIL_OUTBOX_MAX_ATTEMPTS=2,
+        EMAIL_OUTBOX_RETRY_DELAY=datetime.timedelta(minutes=1),
+    )
+    def test_retry(self):
+        (email,) = queue_mail("Hello", "Hello you", None, ["a@turtlemail.app"])
+
+        with mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages",
+            side_effect=ConnectionError("Mail server is gone"),
+        ):
+            self.assertEqual(0, send_queued_mails())
+            email.refresh_from_db()
+            self.assertEqual(OutgoingEmail.Status.PENDING, email.status)
+            self.assertGreater(email.next_attempt_at, timezone.now())
+            self.assertEqual("Mail server is gone", email.last_error)
+
+            # Not due yet
+            self.assertEqual(0, send_queued_mails())
+            email.refresh_from_db()
+            self.assertEqual(1, email.attempts)
+
+            OutgoingEmail.objects.update(next_attempt_at=timezone.now())
+            send_queued_mails()
+            email.refresh_from_db()
+            self.assertEqual(OutgoingEmail.Status.FAILED, email.status)
+
+    @override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=1)
+    def test_connection_failed(self):
+        (email,) = queue_mail("Hello", "Hello you", None, ["a@turtlemail.app"])
+
+        with mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.open",
+            side_effect=ConnectionError("Mail server is gone"),
+        ):
+            self.assertEqual(0, send_queued_mails())
+        email.refresh_from_db()
+        self.assertEqual(OutgoingEmail.Status.PENDING, email.status)
+        self.assertEqual(0, email.attempts)
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        self.assertEqual("Mail server is gone", email.last_error)
@@ -0,0 +1,83 @@
+from django.test import TestCase
+
+from turtlemail.models import Location, Packet, Route, RouteStep, Stay, User
+from turtlemail.tests import TestLocations
+
+
+class WithoutValidRouteTestCase(TestCase):
+    def setUp(self):
+        self.sender = User.objects.create(
+            email="sender@turtlemail.app", username="sender"
+        )
+        self.recipient = User.objects.create(
+            email="recipient@turtlemail.app", username="recipient"
+        )
+        location = Location.objects.create(
+            is_home=False, point=TestLocations.HAMBURG.value, user=self.sender
+        )
+        self.stay = Stay.objects.create(
+            location=location, user=self.sender, frequency=Stay.DAILY
+        )
+
+    def packet_with_route(self, human_id: str, *step_statuses, status=Route.CURRENT):
+        packet = Packet.objects.create(
+            sender=self.sender, recipient=self.recipient, human_id=human_id
+        )
+        route = Route.objects.create(packet=packet, status=status)
+        # bulk_create skips RouteStep.save(), which would start the
+        # delivery as soon as all steps are accepted.
+        RouteStep.objects.bulk_create(
+            RouteStep(
+                stay=self.stay,
+                packet=packet,
+                route=route,
+                position=position,
+                status=step_status,
+            )
+            for position, step_status in enumerate(step_statuses)
+        )
+        return packet
+
+    def test_without_valid_route(self):
+        no_route = Packet.objects.create(
+            sender=self.sender, recipient=self.recipient, human_id="no_route"
+        )
+        cancelled_route = self.packet_with_route(
+            "cancelled_route", RouteStep.SUGGESTED, status=Route.CANCELLED
+        )
+        rejected_step = self.packet_with_route(
+            "rejected_step", RouteStep.ACCEPTED, RouteStep.REJECTED
+        )
+        cancelled_step = self.packet_with_route(
+            "cancelled_step", RouteStep.CANCELLED, RouteStep.SUGGESTED
+        )
+        self.packet_with_route("valid", RouteStep.ACCEPTED, RouteStep.SUGGESTED)
+        self.packet_with_route("delivering", RouteStep.COMPLETED, RouteStep.ONGOING)
+
+        self.assertEqual(
+            set(Packet.objects.without_valid_route()),
+            {no_route, cancelled_route, rejected_step, cancelled_step},
+        )
+
+    def test_annotated_status_matches_status(self):
+        self.packet_with_route("confirming", RouteStep.ACCEPTED, RouteStep.SUGGESTED)
+        self.packet_with_route("outdated", RouteStep.ACCEPTED, RouteStep.REJECTED)
+        self.packet_with_route("ready", RouteStep.ACCEPTED, RouteStep.ACCEPTED)
+        self.packet_with_route("delivering", RouteStep.COMPLETED, RouteStep.ONGOING)
+        self.packet_with_route("delivered", RouteStep.COMPLETED, RouteStep.COMPLETED)
+        Packet.objects.create(
+            sender=self.sender, recipient=self.recipient, human_id="calculating"
+        )
+
+        with self.assertNumQueries(1):
+            annotated = {
+                packet.human_id: packet.status()
+                for packet in Packet.objects.with_routing_state()
+            }
+
+        self.assertEqual(
+            annotated,
+            {packet.human_id: packet.status() for packet in Packet.objects.all()},
+        )
+        self.assertEqual(annotated["delivering"], Packet.Status.DELIVERING)
+        self.assertEqual(annotated["calculating"], Packet.Status.CALCULATING_ROUTE)
@@ -1,8 +1,19 @@
 from datetime import date
+from unittest import mock
 from django.contrib.gis.geos import Point
 from django.test import TestCase
+from django.utils import translation
 
-from turtlemail.models import Location, Packet, Route, RouteStep, Stay, User
+from turtlemail.models import (
+    DeliveryLog,
+    Location,
+    Packet,
+    Route,
+    RouteStep,
+    Stay,
+    SystemChatMessage,
+    User,
+)
 
 
 class ReachableStaysTestCase(TestCase):
@@ -83,3 +94,109 @@ class ReachableStaysTestCase(TestCase):
 
         overlapping_range = step_2.get_overlapping_date_range(step_1)
         self.assertEqual((date(2024, 6, 3), date(2024, 6, 5)), overlapping_range)
+
+    def test_position_follows_previous_step(self):
+        step_1 = RouteStep.objects.create(
+            stay=self.stay,
+            packet=self.packet,
+            route=self.route,
+            status=RouteStep.COMPLETED,
+        )
+        step_2 = RouteStep.objects.create(
+            stay=self.stay,
+            previous_step=step_1,
+            packet=self.packet,
+            route=self.route,
+            status=RouteStep.ONGOING,
+        )
+        step_3 = RouteStep.objects.create(
+            stay=self.stay,
+            previous_step=step_2,
+            packet=self.packet,
+            route=self.route,
+            status=RouteStep.ACCEPTED,
+        )
+
+        self.assertEqual(
+            [0, 1, 2], [step.position for step in (step_1, step_2, step_3)]
+        )
+        with self.assertNumQueries(2):
+            self.assertEqual(step_2, self.packet.get_current_route_step())
+
+    def test_accepting_all_steps_starts_delivery(self):
+        step_1 = RouteStep.objects.create(
+            stay=self.stay,
+            start=date(2024, 5, 30),
+            end=date(2024, 6, 5),
+            packet=self.packet,
+            route=self.route,
+            status=RouteStep.SUGGESTED,
+        )
+        step_2 = RouteStep.objects.create(
+            stay=self.stay,
+            start=date(2024, 6, 3),
+            end=date(2024, 6, 14),
+            previous_step=step_1,
+            packet=self.packet,
+            route=self.route,
+            status=RouteStep.SUGGESTED,
+        )
+
+        step_1.status = RouteStep.ACCEPTED
+        step_1.save()
+        self.assertEqual(0, SystemChatMessage.objects.count())
+
+        step_2.status = RouteStep.ACCEPTED
+        step_2.save()
+        step_1.refresh_from_db()
+        self.assertEqual(RouteStep.ONGOING, step_1.status)
+        self.assertEqual(2, SystemChatMessage.objects.count())
+
+        # Saving without a status change doesn't start the chats again
+        with self.assertNumQueries(1):
+            step_2.save()
+        self.assertEqual(2, SystemChatMessage.objects.count())
+
+        # step_1 was started with an update(), reloading it isn't a change
+        with mock.patch(
+            "turtlemail.models.RouteService.step_status_changed"
+        ) as step_status_changed:
+            step_1.save()
+        step_status_changed.assert_not_called()
+
+    def test_completing_step_logs_location(self):
+        step_1 = RouteStep.objects.create(
+            stay=self.stay,
+            packet=self.packet,
+            route=self.route,
+            remaining_distance=1.234,
+            status=RouteStep.ONGOING,
+        )
+        step_2 = RouteStep.objects.create(
+            stay=self.stay,
+            previous_step=step_1,
+            packet=self.packet,
+            route=self.route,
+            remaining_distance=0,
+            status=RouteStep.ACCEPTED,
+        )
+        step_1.next_step = step_2
+        RouteStep.objects.bulk_update([step_1], ["next_step"])
+
+        # Writing the log entry doesn't look at the rest of the route
+        with self.assertNumQueries(1):
+            step_1.set_status(RouteStep.COMPLETED)
+        step_2.set_status(RouteStep.COMPLETED)
+
+        with self.assertNumQueries(1):
+            logs = list(DeliveryLog.objects.with_description_data())
+            with translation.override("en"):
+                descriptions = [log.describe() for log in logs]
+        self.assertEqual(
+            [
+                "The delivery has reached its destination.",
+                "The packet reached station 1 of 2. It is still 1.23 kilometers "
+                "from its destination.",
+            ],
+            descriptions,
+        )
@@ -0,0 +1,27 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.template.loader import render_to_string
+from django.test import SimpleTestCase
+
+from turtlemail.base.jinja import template_rendered
+
+
+class TemplatesTestCase(SimpleTestCase):
+    def test_render_timing(self):
+        rendered = []
+
+        def receiver(template_name, duration, **kwargs):
+            rendered.append(template_name)
+            self.assertGreaterEqual(duration, 0)
+
+        template_rendered.connect(receiver)
+        self.addCleanup(template_rendered.disconnect, receiver)
+        render_to_string("turtlemail/_chat_receipts.jinja", {"sequences": [1]})
+
+        self.assertEqual(["turtlemail/_chat_receipts.jinja"], rendered)
+
+    def test_compiletemplates(self):
+        out = StringIO()
+        call_command("compiletemplates", stdout=out)
+        self.assertRegex(out.getvalue(), r"^Compiled \d+ templates\.")
@@ -2,10 +2,11 @@ import datetime
 from collections import defaultdict
 
 from django.test import TestCase
+from django.utils import timezone
 
 from turtlemail import stats
-from turtlemail.models import User, Location, Stay
-from turtlemail.tests import TestLocations
+from turtlemail.models import DailyStats, Packet, RouteStep, User, Location, Stay
+from turtlemail.tests import TestLocations, create_route_steps
 
 
 class TestDataMixin:
@@ -78,3 +79,46 @@ class StatsTestCase(TestDataMixin, TestCase):
 
     def test_number_of_stays(self):
         self.assertEqual(stats.get_stay_stats(), {"min": 1, "max": 3, "median": 1.5})
+
+    def test_number_of_stays_odd(self):
+        User.objects.create(email="user5@turtlemail.app", username="user5")
+        self.assertEqual(stats.get_stay_stats(), {"min": 0, "max": 3, "median": 1})
+
+    def test_packet_stats(self):
+        sender, recipient = User.objects.filter(username__in=["user1", "user2"])
+        Packet.objects.create(sender=sender, recipient=recipient, human_id="new")
+        for human_id, status in [
+            ("outdated", RouteStep.REJECTED),
+            ("confirming", RouteStep.SUGGESTED),
+            ("delivering", RouteStep.ACCEPTED),
+            ("delivered", RouteStep.COMPLETED),
+        ]:
+            create_route_steps(
+                sender, recipient, sender, recipient, human_id=human_id, status=status
+            )
+
+        with self.assertNumQueries(3):
+            packets = stats.get_packet_stats()
+        self.assertEqual({"waiting": 2, "in_transit": 2, "delivered": 1}, packets)
+
+    def test_daily_stats(self):
+        today = timezone.localdate()
+        yesterday = today - datetime.timedelta(days=1)
+        User.objects.filter(username="user1").update(
+            date_joined=timezone.now() - datetime.timedelta(days=1)
+        )
+
+        stats.update_daily_stats(today)
+        # only the activity since the last update is counted again
+        stats.update_daily_stats(today)
+
+        self.assertEqual(2, DailyStats.objects.count())
+        days = stats.get_daily_stats(since=yesterday)
+        self.assertEqual(
+            [(yesterday.isoformat(), 1, None), (today.isoformat(), 3, 4)],
+            [(day["date"], day["new_accounts"], day["accounts"]) for day in days],
+        )
+        self.assertEqual(1.5, days[1]["stays_median"])
+        self.assertEqual(
+            [], stats.get_daily_stats(until=yesterday - datetime.timedelta(days=1))
+        )
@@ -24,6 +24,7 @@ from turtlemail import views
 
 urlpatterns = [
     path("-/admin/", admin.site.urls),
+    path("-/metrics", views.MetricsView.as_view(), name="metrics"),
     path(
         "",
         views.IndexView.as_view(),
@@ -40,6 +41,11 @@ urlpatterns = [
     # path("stays", views.StaysView.as_view(), name="stays"),
     path("communication", views.ChatsView.as_view(), name="chats"),
     path("htmx/chat/<int:pk>", views.HtmxChatView.as_view(), name="chat"),
+    path(
+        "htmx/chat/<int:pk>/history",
+        views.HtmxChatHistoryView.as_view(),
+        name="chat_history",
+    ),
     path(
         "htmx/update-request/<int:pk>",
         views.HtmxUpdateRouteStepRequestView.as_view(),
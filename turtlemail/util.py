@@ -11,6 +11,10 @@ def ensure_database_connection(func):
     See https://code.djangoproject.com/ticket/32589
     Long-running management commands are expected to close old/unusable
     connections from time to time.
+
+    Like for web requests, only connections that broke or outlived
+    CONN_MAX_AGE are closed. Others are reused by the next task, after a
+    health check if CONN_HEALTH_CHECKS is set.
     """
 
     @functools.wraps(func)
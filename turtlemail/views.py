@@ -1,7 +1,8 @@
 import datetime
+import hmac
 from typing import TYPE_CHECKING, Any
-from django.contrib.gis.db.models import Count
-from django.db.models import Q
+from django.db.models import Exists, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from urllib.parse import urlencode
 
 from django.conf import settings
@@ -11,11 +12,10 @@ from django.contrib.auth.mixins import (
     UserPassesTestMixin,
 )
 from django.contrib.auth.views import LoginView as _LoginView
-from django.core.mail import send_mail
 from django.db import transaction
 from django.db.models.base import Model as Model
 from django.forms import BaseModelForm
-from django.http import HttpRequest, HttpResponse
+from django.http import Http404, HttpRequest, HttpResponse
 from django.shortcuts import redirect, render
 from django.template.loader import render_to_string
 from django.urls import reverse, reverse_lazy
@@ -29,11 +29,11 @@ from django.views.generic import (
     UpdateView,
     ListView,
 )
-from django.utils import formats
+from django.utils import formats, translation
 
 
-from turtlemail import routing
-from turtlemail.human_id import human_id
+from turtlemail import metrics, routing
+from turtlemail.cache import cached
 from turtlemail.models import (
     DeliveryLog,
     Packet,
@@ -45,8 +45,11 @@ from turtlemail.models import (
     Route,
     Location,
     UserSettings,
+    UnreadChatCounter,
 )
 from turtlemail.notification_service import NotificationService
+from turtlemail.outbox import queue_mail
+from turtlemail.pagination import paginate_descending, paginate_newest_first
 from turtlemail.types import AuthedHttpRequest
 
 from .forms import (
@@ -90,24 +93,68 @@ class DeliveriesView(LoginRequiredMixin, ListView):
         request: AuthedHttpRequest
 
     def get_queryset(self):
-        queryset = super().get_queryset()
-        user_routed_packages = queryset.filter(
-            all_routes__steps__stay__user=self.request.user
+        user_steps = RouteStep.objects.filter(
+            packet=OuterRef("pk"), stay__user=self.request.user
+        )
+        # Everything the template shows per packet is selected and annotated
+        # here, so rendering a page takes the same number of queries
+        # no matter how many packets it shows.
+        queryset = (
+            Packet.objects.with_routing_state()
+            .filter(
+                Q(sender=self.request.user)
+                | Q(recipient=self.request.user)
+                | Exists(user_steps)
+            )
+            .annotate(
+                is_user_involved=Exists(user_steps.filter(route__status=Route.CURRENT))
+            )
+            .select_related("sender", "recipient")
+        )
+        cursor = self.request.GET.get("cursor")
+        # Only the rows and their routing state are cached, which change
+        # with writes only. Packet.status() depends on the current time as
+        # well, so it's derived from them when rendering.
+        self.page = cached(
+            ("deliveries", self.request.user.pk, cursor or ""),
+            [("deliveries", self.request.user.pk)],
+            lambda: paginate_newest_first(
+                queryset, cursor, settings.DELIVERIES_PAGE_LENGTH
+            ),
         )
-        queryset = queryset.filter(
-            Q(sender=self.request.user) | Q(recipient=self.request.user)
-        ).distinct()
-        queryset = queryset.union(user_routed_packages).order_by("-created_at")
 
-        return queryset
+        return self.page.items
+
+    def is_next_page_request(self) -> bool:
+        """The "load more" button requests only the next packets via htmx."""
+        return bool(
+            self.request.headers.get("HX-Request") and self.request.GET.get("cursor")
+        )
+
+    def get_template_names(self):
+        if self.is_next_page_request():
+            return ["turtlemail/_deliveries_list.jinja"]
+        return super().get_template_names()
 
     def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
         context = super().get_context_data(**kwargs)
+        context["next_cursor"] = self.page.next_cursor
+        if self.is_next_page_request():
+            return context
+
+        step_relations = (
+            "stay__user",
+            "stay__location",
+            "packet__sender",
+            "packet__recipient",
+            "previous_step__stay__user",
+            "next_step__stay__user",
+        )
         requested_steps = RouteStep.objects.filter(
             status=RouteStep.SUGGESTED,
             stay__user=self.request.user,
             route__status=Route.CURRENT,
-        ).all()
+        ).select_related(*step_relations)
         context["request_forms"] = [
             RouteStepRequestForm(step) for step in requested_steps
         ]
@@ -116,7 +163,7 @@ class DeliveriesView(LoginRequiredMixin, ListView):
             status=RouteStep.ACCEPTED,
             stay__user=self.request.user,
             route__status=Route.CURRENT,
-        )
+        ).select_related(*step_relations)
         context["routing_forms"] = [
             RouteStepRoutingForm(
                 step, self.request, initial={"choice": RouteStepRoutingForm.Choices.YES}
@@ -288,63 +335,57 @@ class ChatsView(LoginRequiredMixin, TemplateView):
     @staticmethod
     def get_chat_list_context(user: User, active_chat=None) -> list:
         # which chats are available is predicted bei the state of RouteSteps
-        giver_steps_filter = Q(
-            stay__user=user,
-            status__in=[RouteStep.ACCEPTED, RouteStep.ONGOING],
-            route__status=Route.CURRENT,
-            next_step__isnull=False,
-            chatmessage__isnull=False,
-        )
-        receiver_steps_filter = Q(
-            next_step__stay__user=user,
-            status__in=[RouteStep.ACCEPTED, RouteStep.ONGOING],
-            route__status=Route.CURRENT,
-            chatmessage__isnull=False,
-        )
-        route_steps = RouteStep.objects.filter(
-            giver_steps_filter | receiver_steps_filter
-        ).distinct()
-        updated_chats = route_steps.annotate(
-            new_messages=Count(
-                "chatmessage__userchatmessage",
-                filter=Q(
-                    chatmessage__status__in=(
-                        ChatMessage.StatusChoices.NEW,
-                        ChatMessage.StatusChoices.NOTIFIED,
-                    )
-                )
-                & ~Q(chatmessage__userchatmessage__author=user),
+        unread_messages = UnreadChatCounter.objects.filter(
+            user=user, route_step=OuterRef("pk")
+        ).values("count")
+        # Chats, their participants and unread counts in a single query
+        route_steps = (
+            RouteStep.objects.filter(
+                Q(stay__user=user, next_step__isnull=False)
+                | Q(next_step__stay__user=user),
+                Exists(ChatMessage.objects.filter(route_step=OuterRef("pk"))),
+                status__in=[RouteStep.ACCEPTED, RouteStep.ONGOING],
+                route__status=Route.CURRENT,
             )
-        ).filter(new_messages__gt=0)
+            .select_related("stay__user", "next_step__stay__user")
+            .annotate(unread_messages=Coalesce(Subquery(unread_messages), 0))
+        )
         chat_list = []
         for step in route_steps:
             entry = ChatsView.get_chat_context(
                 step,
                 user,
                 active=True if step == active_chat else False,
-                updated=True if step in updated_chats else False,
+                updated=step.unread_messages > 0,
             )
             chat_list.append(entry)
         return chat_list
 
+    @staticmethod
+    def get_cached_chat_list_context(user: User, active_chat=None) -> list:
+        """get_chat_list_context(), cached until the user's chats change."""
+        chat_list = cached(
+            ("chat_list", user.pk, translation.get_language()),
+            [("chats", user.pk)],
+            lambda: ChatsView.get_chat_list_context(user),
+        )
+        if active_chat is None:
+            return chat_list
+        return [
+            {**entry, "active": entry["step_id"] == active_chat.pk}
+            for entry in chat_list
+        ]
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # which chats have new messages?
         # build a template usuable object representing handover chats
-        context["chat_list"] = self.get_chat_list_context(self.request.user)
+        context["chat_list"] = self.get_cached_chat_list_context(self.request.user)
 
         return context
 
 
-class HtmxChatView(UserPassesTestMixin, DetailView):
-    """
-    View containing the chat history
-    takes route_step pk as param
-    """
-
-    model = RouteStep
-    template_name = "turtlemail/_chat.jinja"
-
+class ChatParticipantMixin(UserPassesTestMixin):
     if TYPE_CHECKING:
         request: AuthedHttpRequest
 
@@ -352,19 +393,41 @@ class HtmxChatView(UserPassesTestMixin, DetailView):
         """
         only allowed if part of this route step
         """
-        self.object: RouteStep = self.get_object()
+        self.object: RouteStep = self.get_object()  # type: ignore
         return (
             self.request.user == self.object.stay.user
             or self.request.user == self.object.next_step.stay.user
         )
 
+
+def chat_history_context(step: RouteStep, cursor: str | None) -> dict[str, Any]:
+    page = paginate_descending(
+        ChatMessage.objects.filter(route_step=step).select_subclasses(),
+        "sequence",
+        cursor,
+        settings.CHAT_PAGE_LENGTH,
+    )
+    return {
+        # oldest first, as they are shown
+        "chat_msgs": page.items[::-1],
+        "chat_msgs_cursor": page.next_cursor,
+    }
+
+
+class HtmxChatView(ChatParticipantMixin, DetailView):
+    """
+    View containing the latest chat messages
+    takes route_step pk as param
+    """
+
+    model = RouteStep
+    template_name = "turtlemail/_chat.jinja"
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["user"] = self.request.user
-        context["chat_msgs"] = ChatMessage.objects.filter(
-            route_step=self.object
-        ).select_subclasses()
-        context["chat_list"] = ChatsView.get_chat_list_context(
+        context.update(chat_history_context(self.object, cursor=None))
+        context["chat_list"] = ChatsView.get_cached_chat_list_context(
             self.request.user, active_chat=self.object
         )
         # mark all foreign messages read and update htmx ws
@@ -372,6 +435,24 @@ class HtmxChatView(UserPassesTestMixin, DetailView):
         return context
 
 
+class HtmxChatHistoryView(ChatParticipantMixin, DetailView):
+    """
+    Older messages of a chat, loaded when scrolling up
+    takes route_step pk as param
+    """
+
+    model = RouteStep
+    template_name = "turtlemail/_chat_history.jinja"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["user"] = self.request.user
+        context.update(
+            chat_history_context(self.object, self.request.GET.get("cursor"))
+        )
+        return context
+
+
 class HtmxCreateStayView(LoginRequiredMixin, CreateView):
     model = Stay
     template_name = "turtlemail/stays/create_form.jinja"
@@ -658,10 +739,8 @@ class CreatePacketView(LoginRequiredMixin, TemplateView):
         if not form.cleaned_data["confirm_recipient"]:
             return self.render_to_response(context)
 
-        packet = Packet.objects.create(
-            sender=request.user,
-            recipient=context["recipient"],
-            human_id=human_id.generate_id(),
+        packet = Packet.objects.create_with_human_id(
+            sender=request.user, recipient=context["recipient"]
         )
 
         DeliveryLog.objects.create(packet=packet, action=DeliveryLog.SEARCHING_ROUTE)
@@ -671,6 +750,17 @@ class CreatePacketView(LoginRequiredMixin, TemplateView):
         return redirect(to=reverse("packet_detail", args=(packet.human_id,)))
 
 
+def delivery_logs_context(packet: Packet, cursor: str | None) -> dict[str, Any]:
+    page = paginate_newest_first(
+        packet.delivery_logs.with_description_data(), cursor, settings.ACTIVITY_LENGTH
+    )
+    return {
+        "delivery_logs": page.items,
+        "has_more_delivery_logs": page.has_more,
+        "next_delivery_logs_cursor": page.next_cursor,
+    }
+
+
 class PacketDetailView(UserPassesTestMixin, DetailView):
     template_name = "turtlemail/packet_detail.jinja"
     model = Packet
@@ -688,13 +778,15 @@ class PacketDetailView(UserPassesTestMixin, DetailView):
             cx["users_route_steps"] = current_route.steps.filter(
                 stay__user_id=self.request.user.id
             )
+            cx["route_progress"] = cached(
+                ("route_progress", current_route.pk),
+                [("packet", packet.pk)],
+                current_route.progress,
+            )
         else:
             cx["users_route_steps"] = []
 
-        cx["delivery_logs"] = packet.delivery_logs.all()[: settings.ACTIVITY_LENGTH]
-        cx["has_more_delivery_logs"] = (
-            len(packet.delivery_logs.all()) > settings.ACTIVITY_LENGTH
-        )
+        cx.update(delivery_logs_context(packet, cursor=None))
         return cx
 
     def test_func(self) -> bool | None:
@@ -734,24 +826,15 @@ class CancelPacketView(UserPassesTestMixin, View):
 
 
 class HtmxExpandActivitiesView(DetailView):
-    template_name = "turtlemail/_activities.jinja"
-    model = DeliveryLog
-    context_object_name = "logs"
+    """Load the next page of a packet's activity feed."""
 
-    def get_object(self, queryset=None):
-        slug = self.kwargs.get("slug")
-
-        packet = Packet.objects.get_by_natural_key(human_id=slug)
-        queryset = packet.delivery_logs.all()
-
-        return queryset
+    template_name = "turtlemail/_activities.jinja"
+    model = Packet
+    slug_field = "human_id"
 
     def get_context_data(self, **kwargs):
         cx = super().get_context_data(**kwargs)
-        slug = self.kwargs.get("slug")
-        packet = Packet.objects.get_by_natural_key(human_id=slug)
-        cx["delivery_logs"] = packet.delivery_logs.all()
-        cx["packet"] = packet
+        cx.update(delivery_logs_context(self.object, self.request.GET.get("cursor")))
         return cx
 
 
@@ -782,7 +865,7 @@ class HtmxInviteUserView(LoginRequiredMixin, CreateView):
                     ),
                 },
             )
-            send_mail(
+            queue_mail(
                 subject=_("You've been invited to turtlemail!"),
                 message=mail_text,
                 from_email=None,
@@ -798,3 +881,19 @@ class AcceptInviteView(View):
         url = reverse("signup")
         query_params = urlencode({"email": invite.email})
         return redirect(f"{url}?{query_params}")
+
+
+class MetricsView(View):
+    """Metrics for Prometheus, only served if METRICS_TOKEN is set."""
+
+    def get(self, request: HttpRequest):
+        if not settings.METRICS_TOKEN:
+            raise Http404()
+        authorization = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(
+            authorization.encode(), f"Bearer {settings.METRICS_TOKEN}".encode()
+        ):
+            return HttpResponse(status=401, headers={"WWW-Authenticate": "Bearer"})
+        return HttpResponse(
+            metrics.expose(), content_type="text/plain; version=0.0.4; charset=utf-8"
+        )